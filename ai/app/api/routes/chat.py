@@ -1,11 +1,30 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.rag_chain import get_rag_chain
-from app.models.chat import ChatRequest, ChatResponse
+from app.models.chat import ChatRequest, ChatResponse, Source
+from app.utils.concurrency import get_chat_semaphore, run_in_cpu_pool
+from typing import List, Optional
+import json
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
+async def _get_chain_or_400(session_id: str, collections: Optional[List[str]] = None):
+    # Loading the indexes and building the chain may block, keep it off the event loop
+    rag_chain = await run_in_cpu_pool(get_rag_chain, session_id, collections)
+    if not rag_chain:
+         raise HTTPException(status_code=400, detail="Vector store not initialized. Please upload a document first.")
+    return rag_chain
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
 
@@ -14,15 +33,66 @@ async def chat(request: ChatRequest):
         request.session_id = str(uuid.uuid4())
         
     try:
-        rag_chain = get_rag_chain(request.session_id)
-        if not rag_chain:
-             raise HTTPException(status_code=400, detail="Vector store not initialized. Please upload a document first.")
+        rag_chain = await _get_chain_or_400(request.session_id, request.collections)
         
-        response = rag_chain.invoke(
-            {"input": request.query},
-            config={"configurable": {"session_id": request.session_id}}
-        )
+        async with get_chat_semaphore():
+            response = await rag_chain.ainvoke(
+                {"input": request.query},
+                config={"configurable": {"session_id": request.session_id}}
+            )
         
         return ChatResponse(answer=response["answer"], session_id=request.session_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream the answer as Server-Sent Events: one `sources` event with the retrieved
+    chunks, `token` events as the answer is generated, then `done` (or `error`).
+    """
+    if not request.session_id:
+        request.session_id = str(uuid.uuid4())
+
+    try:
+        rag_chain = await _get_chain_or_400(request.session_id, request.collections)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        async with get_chat_semaphore():
+            try:
+                # The history wrapper saves the full answer to the session once the stream ends
+                async for chunk in rag_chain.astream(
+                    {"input": request.query},
+                    config={"configurable": {"session_id": request.session_id}}
+                ):
+                    if "context" in chunk:
+                        sources = [
+                            Source(
+                                source=doc.metadata.get("source"),
+                                page=doc.metadata.get("page"),
+                                content=doc.page_content,
+                                metadata=doc.metadata,
+                            ).model_dump()
+                            for doc in chunk["context"]
+                        ]
+                        yield _sse("sources", sources)
+                    if chunk.get("answer"):
+                        yield _sse("token", {"token": chunk["answer"]})
+                yield _sse("done", {"session_id": request.session_id})
+            except Exception as e:
+                logger.error(f"Error streaming chat response: {e}")
+                yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,34 +1,51 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-import shutil
+import asyncio
 import os
-from app.ingestion.loader import load_pdf
-from app.ingestion.splitter import split_documents
-from app.vector_store.faiss_store import add_documents_to_vector_store
+import tempfile
+from app.config.config import get_settings
+from app.ingestion.jobs import job_manager, QueueFullError
 
 router = APIRouter()
 
 from fastapi import Form
 from typing import Optional
 
-@router.post("/upload")
+UPLOAD_READ_SIZE = 1024 * 1024
+
+@router.post("/upload", status_code=202)
 async def upload_file(file: UploadFile = File(...), session_id: Optional[str] = Form(None)):
+    temp_file_path = None
     try:
         if not file.filename.endswith(".pdf"):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-        # loader (PyPDFLoader) can get only file path, not file object.
-        # We need to save the file to a temporary location first.And then pass the path to the loader.
-        # Then remove it later
-        temp_file_path = f"temp_{file.filename}"
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        documents = load_pdf(temp_file_path)
-        chunks = split_documents(documents)
-        add_documents_to_vector_store(chunks, session_id)
+        # The ingestion workers read the PDF from a file path, so stream the upload to a
+        # uniquely named temp file (concurrent uploads of the same filename can't collide).
+        # The ingestion job removes it when it is done.
+        with tempfile.NamedTemporaryFile(
+            prefix="upload_", suffix=".pdf", dir=get_settings().UPLOAD_TEMP_DIR, delete=False
+        ) as buffer:
+            temp_file_path = buffer.name
+            while data := await file.read(UPLOAD_READ_SIZE):
+                buffer.write(data)
 
-        os.remove(temp_file_path)
+        # Checking the shared queue depth talks to MongoDB, keep it off the event loop
+        job = await asyncio.to_thread(job_manager.submit, temp_file_path, file.filename, session_id)
+        temp_file_path = None
 
-        return {"message": "File processed and added to vector store", "chunks": len(chunks), "session_id": session_id}
+        return {
+            "message": "File queued for processing",
+            "job_id": job.job_id,
+            "status_url": f"/jobs/{job.job_id}",
+            "session_id": session_id,
+        }
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Only set if the job was never queued
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
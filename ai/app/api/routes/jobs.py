@@ -0,0 +1,12 @@
+from fastapi import APIRouter, HTTPException
+from app.ingestion.jobs import job_manager
+from app.models.job import JobStatus
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
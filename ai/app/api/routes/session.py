@@ -1,11 +1,26 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
 from app.core.memory import session_service
 
 router = APIRouter()
 
 @router.get("/sessions")
-def get_sessions():
-    return session_service.get_all_sessions()
+def get_sessions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+):
+    """
+    List sessions, most recently active first. With `limit`, the cursor for the next
+    page is returned in the X-Next-Cursor header; pass it back as `after`.
+    """
+    try:
+        sessions, next_cursor = session_service.list_sessions(limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return sessions
 
 @router.get("/sessions/{session_id}")
 def get_session_history(session_id: str):
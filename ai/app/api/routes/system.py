@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.ingestion.embedder import is_embedder_ready
+from app.core.rag_chain import is_llm_ready
+from app.vector_store.faiss_store import index_cache
+from app.core.rewrite import rewrite_stats
+from app.core.semantic_cache import semantic_cache
+from app.utils.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/ready")
+async def ready():
+    # Answered on the event loop, so it never queues behind blocking work in the thread pool
+    status = {
+        "embedder": "loaded" if is_embedder_ready() else "loading",
+        "llm": "loaded" if is_llm_ready() else "loading",
+    }
+    if "loading" in status.values():
+        return JSONResponse(status_code=503, content={"ready": False, **status})
+    return {"ready": True, **status}
+
+@router.get("/cache/stats")
+def cache_stats():
+    return {"index_cache": index_cache.stats(), "semantic_cache": semantic_cache.stats()}
+
+@router.get("/stats/question-rewrite")
+def question_rewrite_stats():
+    return rewrite_stats.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage and request latency histograms in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import model_validator
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     GOOGLE_API_KEY: str
@@ -10,10 +11,129 @@ class Settings(BaseSettings):
     MONGODB_HOST: str = "localhost"
     MONGODB_PORT: int = 27017
     MONGODB_COLLECTION_CHAT_HISTORY: str = "chat_histories"
+    MONGODB_COLLECTION_CHAT_SUMMARIES: str = "chat_summaries"
+    # One document per session (first/last message, count), kept up to date on write
+    MONGODB_COLLECTION_CHAT_SESSIONS: str = "chat_sessions"
+    MONGODB_COLLECTION_INGESTION_JOBS: str = "ingestion_jobs"
     MONGODB_URL: Optional[str] = None
+    # Connection pool of the process-wide MongoDB client
+    MONGODB_MAX_POOL_SIZE: int = 50
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: Optional[int] = 300000
+    # Chat history objects kept in memory, evicted by LRU or after the TTL (seconds)
+    SESSION_HISTORY_CACHE_SIZE: int = 1024
+    SESSION_HISTORY_CACHE_TTL: int = 3600
+    # Turns of chat history sent to the LLM (0 sends the whole conversation)
+    HISTORY_WINDOW_TURNS: int = 6
+    # Keep a rolling LLM summary of turns that fall out of the window
+    HISTORY_SUMMARY_ENABLED: bool = False
+    # Messages folded into the summary per LLM call: at least MIN have to fall out of the
+    # window first, so long sessions don't pay a summary call every turn, and at most MAX
+    # are read at a time (more are folded in several calls)
+    HISTORY_SUMMARY_MIN_FOLD: int = 12
+    HISTORY_SUMMARY_MAX_FOLD: int = 100
+    # When to rewrite follow-up questions with the LLM: "always", "heuristic" or "never"
+    QUESTION_REWRITE_POLICY: str = "heuristic"
+    # Heuristic policy: also rewrite when the question's embedding is at least this
+    # similar to the previous question (unset disables the check)
+    QUESTION_REWRITE_SIMILARITY_THRESHOLD: Optional[float] = None
+    # Reuse answers to near-identical questions against the same collection
+    SEMANTIC_CACHE_ENABLED: bool = True
+    # Minimum cosine similarity between standalone questions for a cache hit
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 10000
     LOG_LEVEL: str = "INFO"
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    # Upper bound on the memory used by loaded FAISS indexes kept between requests
+    INDEX_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # Number of assembled RAG chains kept between requests
+    RAG_CHAIN_CACHE_SIZE: int = 256
+    # FAISS index type per collection: "flat", "hnsw" or "ivfpq" (trained once a collection
+    # reaches FAISS_IVF_TRAIN_THRESHOLD vectors). Overrides map collection names to types,
+    # e.g. FAISS_INDEX_TYPE_OVERRIDES='{"shared_kb": "hnsw"}'
+    FAISS_INDEX_TYPE: str = "flat"
+    FAISS_INDEX_TYPE_OVERRIDES: Dict[str, str] = {}
+    # "cosine" (normalized embeddings, inner product) or "l2"
+    FAISS_METRIC: str = "cosine"
+    FAISS_HNSW_M: int = 32
+    FAISS_HNSW_EF_CONSTRUCTION: int = 80
+    FAISS_HNSW_EF_SEARCH: int = 64
+    FAISS_IVF_TRAIN_THRESHOLD: int = 10000
+    FAISS_IVF_NLIST: int = 1024
+    FAISS_IVF_NPROBE: int = 16
+    # Sub-quantizers must divide the embedding dimension (384 for MiniLM)
+    FAISS_PQ_M: int = 48
+    FAISS_PQ_NBITS: int = 8
+    # Merge a collection's on-disk segments once it has more than this many
+    INDEX_COMPACTION_SEGMENTS: int = 16
+    # Rebuild a collection's index snapshot once this many vectors (or a quarter of the
+    # snapshot, if more) were added since the last one
+    INDEX_SNAPSHOT_MIN_VECTORS: int = 2000
+    # Memory-map index snapshots read-only so worker processes share their pages
+    INDEX_MMAP_ENABLED: bool = True
+    # "hybrid" fuses BM25 and vector search with reciprocal rank fusion; "dense" is vector search only
+    RETRIEVAL_MODE: str = "hybrid"
+    # Chunks retrieved as context for each question
+    RETRIEVAL_K: int = 4
+    # Candidates taken from each of the dense and sparse searches before fusion
+    RETRIEVAL_FETCH_K: int = 20
+    # Weights of the dense and sparse rankings in the fusion
+    RETRIEVAL_DENSE_WEIGHT: float = 1.0
+    RETRIEVAL_SPARSE_WEIGHT: float = 1.0
+    # RRF constant; larger values flatten the difference between top ranks
+    RETRIEVAL_RRF_K: int = 60
+    # Collections searched by every chat besides the session's own, e.g. a shared
+    # knowledge base: SHARED_COLLECTIONS='["shared_kb"]'
+    SHARED_COLLECTIONS: List[str] = []
+    # Time budget (ms) for searching several collections at once; collections that
+    # haven't answered by then are left out (unset waits for all of them)
+    FANOUT_LATENCY_BUDGET_MS: Optional[int] = 250
+    # Fraction of requests and ingestion jobs whose stage timings are recorded for /metrics
+    METRICS_SAMPLE_RATE: float = 1.0
+    # Log one JSON line with the stage timings of each sampled request
+    REQUEST_LOG_ENABLED: bool = False
+    # Threads for CPU-bound work (embedding, FAISS search) shared by all requests
+    CPU_POOL_WORKERS: int = 4
+    # Maximum number of chat requests running the RAG chain at once per worker
+    CHAT_MAX_CONCURRENCY: int = 32
+    # Ingestion jobs run concurrently; each one is driven by a thread
+    INGESTION_WORKERS: int = 2
+    # Worker processes for PDF parsing, splitting and embedding (0 runs them in the job thread)
+    INGESTION_PROCESSES: int = 2
+    # Uploads accepted but not yet finished; further uploads are rejected with 429
+    INGESTION_QUEUE_DEPTH: int = 16
+    # Chunks sent to an embedding worker at a time. With INGESTION_PROCESSES=0 and an
+    # encode pool (EMBEDDING_MULTI_PROCESS_WORKERS), batches are raised to
+    # EMBEDDING_MULTI_PROCESS_MIN_TEXTS so they actually reach the pool
+    INGESTION_EMBED_BATCH_SIZE: int = 64
+    # Pages extracted by one worker task
+    INGESTION_PAGES_PER_TASK: int = 8
+    # Embedding engine: "torch", "onnx" or "onnx-int8" (quantized, needs sentence-transformers[onnx])
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_INT8_FILE: str = "onnx/model_quint8_avx2.onnx"
+    EMBEDDING_BATCH_SIZE: int = 32
+    # Intra-op threads used by one encode call (library default if unset)
+    EMBEDDING_NUM_THREADS: Optional[int] = None
+    # Processes in a persistent encode pool for batches of at least
+    # EMBEDDING_MULTI_PROCESS_MIN_TEXTS texts (0 disables it). Meant for INGESTION_PROCESSES=0:
+    # ingestion worker processes already embed in parallel and never start a pool
+    EMBEDDING_MULTI_PROCESS_WORKERS: int = 0
+    EMBEDDING_MULTI_PROCESS_MIN_TEXTS: int = 512
+    # SQLite file caching chunk embeddings across uploads (empty disables the cache)
+    EMBEDDING_CACHE_PATH: Optional[str] = "embedding_cache/embeddings.sqlite3"
+    # Where uploads are spooled before ingestion (system temp dir if unset)
+    UPLOAD_TEMP_DIR: Optional[str] = None
+    # Finished jobs remembered for /jobs/{job_id}
+    INGESTION_JOB_HISTORY: int = 1000
+    # Keep job status in MongoDB, so /jobs/{job_id} and the queue depth work across
+    # uvicorn workers (false keeps them in each worker's memory)
+    INGESTION_JOBS_SHARED: bool = True
+    # A job whose worker hasn't updated it for this long no longer counts against the queue
+    INGESTION_JOB_LEASE_SECONDS: int = 600
+    # Job status documents are removed from MongoDB this long after their last update
+    INGESTION_JOB_TTL_SECONDS: int = 86400
 
     # If there are extra variables in .env that aren't defined in this class, 
     # they will be ignored instead of causing an error
@@ -31,4 +151,9 @@ class Settings(BaseSettings):
         # If present, It uses the one provided in .env file
         return self
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Load the settings from the environment and .env, once per process.
+    """
+    return Settings()
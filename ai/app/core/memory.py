@@ -1,30 +1,267 @@
 from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
-from typing import List, Dict, Any, Optional
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from bson import ObjectId
 import pymongo
 import json
 import logging
-from app.config.config import settings
+import threading
+import time
+from app.config.config import get_settings
+from app.utils.metrics import span
 
 logger = logging.getLogger(__name__)
 
+# Field names used by MongoDBChatMessageHistory documents
+SESSION_ID_KEY = "SessionId"
+HISTORY_KEY = "History"
+# Placeholder session id that is never listed
+TEMP_SESSION_ID = "temp"
+
+_mongo_client: Optional[pymongo.MongoClient] = None
+_mongo_client_lock = threading.Lock()
+
+class SessionHistoryCache:
+    """LRU cache of chat history objects whose entries also expire after a TTL"""
+
+    def __init__(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        # Unset limits are read from the settings when used, so the shared cache can be
+        # created at import without loading them
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[MongoDBChatMessageHistory, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size if self._max_size is not None else get_settings().SESSION_HISTORY_CACHE_SIZE
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self._ttl_seconds if self._ttl_seconds is not None else get_settings().SESSION_HISTORY_CACHE_TTL
+
+    def get(self, session_id: str) -> Optional[MongoDBChatMessageHistory]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def put(self, session_id: str, history: MongoDBChatMessageHistory):
+        with self._lock:
+            self._entries[session_id] = (history, time.monotonic())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class WindowedMongoDBChatMessageHistory(MongoDBChatMessageHistory):
+    """
+    Chat history that only loads the last window_turns turns with a sorted, limited
+    query, optionally preceded by a rolling summary of the older turns. This keeps
+    prompt size and Mongo reads constant however long the conversation gets.
+    """
+
+    def __init__(
+        self,
+        *args,
+        window_turns: int = 0,
+        summary_enabled: bool = False,
+        summary_min_fold: int = 1,
+        summary_max_fold: int = 100,
+        **kwargs,
+    ):
+        settings = get_settings()
+        super().__init__(*args, **kwargs)
+        self.window_turns = window_turns
+        self.summary_enabled = summary_enabled
+        self.summary_min_fold = max(1, summary_min_fold)
+        self.summary_max_fold = max(self.summary_min_fold, summary_max_fold)
+        self.summaries = self.db[settings.MONGODB_COLLECTION_CHAT_SUMMARIES]
+        self.sessions = self.db[settings.MONGODB_COLLECTION_CHAT_SESSIONS]
+
+    @property
+    def window_size(self) -> int:
+        # One turn is a human message plus the AI answer
+        return self.window_turns * 2
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore
+        """Recent messages for the prompt, preceded by the summary of older ones"""
+        if not self.window_turns:
+            return self.all_messages()
+
+        with span("history_read"):
+            cursor = (
+                self.collection.find({self.session_id_key: self.session_id})
+                .sort("_id", -1)
+                .limit(self.window_size)
+            )
+            items = [json.loads(document[self.history_key]) for document in cursor]
+            messages = messages_from_dict(list(reversed(items)))
+
+            if self.summary_enabled:
+                summary = self.get_summary()
+                if summary:
+                    messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return messages
+
+    def all_messages(self) -> List[BaseMessage]:
+        """Every message of the session, oldest first"""
+        with span("history_read"):
+            cursor = self.collection.find({self.session_id_key: self.session_id}).sort("_id", 1)
+            return messages_from_dict([json.loads(document[self.history_key]) for document in cursor])
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        documents = [
+            {self.session_id_key: self.session_id, self.history_key: json.dumps(message_to_dict(message))}
+            for message in messages
+        ]
+        if not documents:
+            return
+        with span("history_write"):
+            message_ids = self.collection.insert_many(documents).inserted_ids
+            _record_session_activity(self.sessions, self.session_id, message_ids, documents[-1][self.history_key])
+        if self.summary_enabled and self.window_turns:
+            _schedule_summary_update(self)
+
+    def clear(self) -> None:
+        super().clear()
+        self.summaries.delete_one({self.session_id_key: self.session_id})
+        self.sessions.delete_one({"_id": self.session_id})
+
+    def get_summary(self) -> Optional[str]:
+        document = self.summaries.find_one({self.session_id_key: self.session_id})
+        return document["summary"] if document else None
+
+    def update_summary(self):
+        """
+        Fold messages that have dropped out of the window into the rolling summary, once
+        at least summary_min_fold of them have. A session with more than
+        summary_max_fold unsummarized messages (e.g. when summaries are turned on for it)
+        is folded in several bounded reads and LLM calls.
+        """
+        while self._fold_next():
+            pass
+
+    def _fold_next(self) -> bool:
+        summary_doc = self.summaries.find_one({self.session_id_key: self.session_id}) or {}
+        query = {self.session_id_key: self.session_id}
+        if summary_doc.get("last_summarized_id"):
+            query["_id"] = {"$gt": summary_doc["last_summarized_id"]}
+        # Only counts as far as it needs to, through the (SessionId, _id) index
+        outside = self.collection.count_documents(
+            query, limit=self.window_size + self.summary_max_fold
+        ) - self.window_size
+        if outside < self.summary_min_fold:
+            return False
+        to_fold = list(self.collection.find(query).sort("_id", 1).limit(outside))
+
+        new_lines = "\n".join(
+            f"{message.type}: {message.content}"
+            for message in messages_from_dict([json.loads(d[self.history_key]) for d in to_fold])
+        )
+        # Imported here: the RAG chain module depends on this one
+        from app.core.rag_chain import get_llm
+        from app.core.prompt import summarize_history_prompt
+        response = get_llm().invoke(summarize_history_prompt.format_messages(
+            summary=summary_doc.get("summary", ""), new_lines=new_lines
+        ))
+        self.summaries.update_one(
+            {self.session_id_key: self.session_id},
+            {"$set": {"summary": response.content, "last_summarized_id": to_fold[-1]["_id"]}},
+            upsert=True,
+        )
+        return True
+
+def _record_session_activity(sessions, session_id: str, message_ids: Sequence[ObjectId], last_history: str):
+    # The per-session document list_sessions pages over, kept up to date on every write
+    try:
+        sessions.update_one(
+            {"_id": session_id},
+            {
+                "$min": {"first_id": message_ids[0]},
+                "$max": {"last_id": message_ids[-1]},
+                "$inc": {"message_count": len(message_ids)},
+                "$set": {"last_history": last_history},
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        logger.error(f"Error updating session {session_id}: {e}")
+
+# Summaries are refreshed off the request path, at most one at a time per session
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+_summaries_in_progress = set()
+_summaries_lock = threading.Lock()
+
+def _schedule_summary_update(history: WindowedMongoDBChatMessageHistory):
+    with _summaries_lock:
+        if history.session_id in _summaries_in_progress:
+            # The running update or the next turn will pick these messages up
+            return
+        _summaries_in_progress.add(history.session_id)
+
+    def run():
+        try:
+            history.update_summary()
+        except Exception as e:
+            logger.error(f"Error updating history summary: {e}")
+        finally:
+            with _summaries_lock:
+                _summaries_in_progress.discard(history.session_id)
+
+    _summary_executor.submit(run)
+
 class SessionService:
     """Service to handle session history and statistics"""
 
     def __init__(self):
-        self.session_histories: Dict[str, MongoDBChatMessageHistory] = {}
+        self.session_histories = SessionHistoryCache()
 
     def get_or_create_session_history(
         self, session_id: str
-    ) -> MongoDBChatMessageHistory:
+    ) -> WindowedMongoDBChatMessageHistory:
         """Get or create MongoDB chat message history for a session"""
-        if session_id not in self.session_histories:
-            self.session_histories[session_id] = MongoDBChatMessageHistory(
-                connection_string=settings.MONGODB_URL,
+        settings = get_settings()
+        history = self.session_histories.get(session_id)
+        if history is None:
+            history = WindowedMongoDBChatMessageHistory(
+                connection_string=None,
+                # Share the process-wide connection pool instead of opening a client per session
+                client=get_mongo_client(),
                 database_name=settings.MONGO_INITDB_DATABASE,
                 collection_name=settings.MONGODB_COLLECTION_CHAT_HISTORY,
                 session_id=session_id,
+                session_id_key=SESSION_ID_KEY,
+                history_key=HISTORY_KEY,
+                # The (SessionId, _id) index is created once at startup
+                create_index=False,
+                window_turns=settings.HISTORY_WINDOW_TURNS,
+                summary_enabled=settings.HISTORY_SUMMARY_ENABLED,
+                summary_min_fold=settings.HISTORY_SUMMARY_MIN_FOLD,
+                summary_max_fold=settings.HISTORY_SUMMARY_MAX_FOLD,
             )
-        return self.session_histories[session_id]
+            self.session_histories.put(session_id, history)
+        return history
 
     def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Get chat history for a session"""
@@ -32,7 +269,7 @@ class SessionService:
             chat_history = self.get_or_create_session_history(session_id)
             messages = []
 
-            for message in chat_history.messages:
+            for message in chat_history.all_messages():
                 messages.append(
                     {
                         "type": message.type,
@@ -55,8 +292,7 @@ class SessionService:
             chat_history.clear()
 
             # Remove from local cache
-            if session_id in self.session_histories:
-                del self.session_histories[session_id]
+            self.session_histories.pop(session_id)
 
             return True
         except Exception as e:
@@ -67,7 +303,7 @@ class SessionService:
         """Get session statistics"""
         try:
             chat_history = self.get_or_create_session_history(session_id)
-            messages = chat_history.messages
+            messages = chat_history.all_messages()
 
             if not messages:
                 return {
@@ -94,60 +330,125 @@ class SessionService:
 
     def get_all_sessions(self) -> List[Dict[str, Any]]:
         """Get list of all chat sessions with metadata"""
+        sessions, _ = self.list_sessions()
+        return sessions
+
+    def list_sessions(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of chat sessions, most recently active first. Reads the per-session
+        documents kept up to date on every write through the (last_id, _id) index, so a
+        page costs the same however many sessions and messages there are.
+        Returns the sessions and the cursor for the next page (None on the last page).
+        """
         try:
-            # Connect to MongoDB directly to query distinct session IDs
-            client = pymongo.MongoClient(settings.MONGODB_URL)
-            db = client[settings.MONGO_INITDB_DATABASE]
-            collection = db[settings.MONGODB_COLLECTION_CHAT_HISTORY]
-            
-            # Create a temporary instance to get the key names          
-            temp_history = MongoDBChatMessageHistory(
-                connection_string=settings.MONGODB_URL,
-                database_name=settings.MONGO_INITDB_DATABASE,
-                collection_name=settings.MONGODB_COLLECTION_CHAT_HISTORY,
-                session_id="temp"
-            )
-            
-            # Get unique session IDs
-            session_ids = collection.distinct(temp_history.session_id_key)
-            
-            # For each session, get the first and last message to show preview and timestamp
+            query: Dict[str, Any] = {"_id": {"$ne": TEMP_SESSION_ID}}
+            if after:
+                last_id, session_id = _decode_cursor(after)
+                query["$or"] = [
+                    {"last_id": {"$lt": last_id}},
+                    {"last_id": last_id, "_id": {"$lt": session_id}},
+                ]
+            cursor = get_sessions_collection().find(query).sort([("last_id", -1), ("_id", -1)])
+            if limit:
+                cursor = cursor.limit(limit)
+
             sessions = []
-            for session_id in session_ids:
-                if session_id == "temp": continue
+            last_row = None
+            for row in cursor:
+                last_row = row
+                # Parse the message content
+                last_message_content = json.loads(row["last_history"])
+                sessions.append({
+                    "session_id": row["_id"],
+                    "created_at": row["first_id"].generation_time.isoformat(), # Convert to string for JSON serialization
+                    "updated_at": row["last_id"].generation_time.isoformat(),
+                    "preview": last_message_content.get("data", {}).get("content", "")[:50] + "...",
+                    "message_count": row["message_count"],
+                })
 
-                # Get first message timestamp (creation time)
-                first_message = collection.find_one(
-                    {temp_history.session_id_key: session_id},
-                    sort=[("_id", 1)]
-                )
-                
-                # Get last message for preview
-                last_message = collection.find_one(
-                    {temp_history.session_id_key: session_id},
-                    sort=[("_id", -1)]
-                )
-                
-                if first_message and last_message:
-                    # Parse the message content
-                    last_message_content = json.loads(last_message[temp_history.history_key])
-                        
-                    sessions.append({
-                        "session_id": session_id,
-                        "created_at": first_message.get("_id").generation_time.isoformat(), # Convert to string for JSON serialization
-                        "updated_at": last_message.get("_id").generation_time.isoformat(),
-                        "preview": last_message_content.get("data", {}).get("content", "")[:50] + "...",
-                        "message_count": collection.count_documents({
-                            temp_history.session_id_key: session_id
-                        })
-                    })
-
-            # Sort by most recent activity
-            sessions.sort(key=lambda x: x["updated_at"], reverse=True)
-            return sessions
-            
+            next_cursor = None
+            if limit and last_row is not None and len(sessions) == limit:
+                next_cursor = _encode_cursor(last_row["last_id"], last_row["_id"])
+            return sessions, next_cursor
+
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Error getting sessions: {e}")
             raise
 
+def _encode_cursor(last_id: ObjectId, session_id: str) -> str:
+    return f"{last_id}:{session_id}"
+
+def _decode_cursor(cursor: str) -> Tuple[ObjectId, str]:
+    last_id, _, session_id = cursor.partition(":")
+    if not ObjectId.is_valid(last_id) or not session_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return ObjectId(last_id), session_id
+
+def get_mongo_client() -> pymongo.MongoClient:
+    """
+    Get the process-wide MongoDB client. pymongo clients are thread-safe and pool
+    their connections, so every query should go through this one.
+    """
+    global _mongo_client
+    settings = get_settings()
+    if _mongo_client is None:
+        with _mongo_client_lock:
+            if _mongo_client is None:
+                _mongo_client = pymongo.MongoClient(
+                    settings.MONGODB_URL,
+                    maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+                    minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+                    maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+                )
+    return _mongo_client
+
+def get_chat_history_collection():
+    settings = get_settings()
+    return get_mongo_client()[settings.MONGO_INITDB_DATABASE][settings.MONGODB_COLLECTION_CHAT_HISTORY]
+
+def get_sessions_collection():
+    settings = get_settings()
+    return get_mongo_client()[settings.MONGO_INITDB_DATABASE][settings.MONGODB_COLLECTION_CHAT_SESSIONS]
+
+def _backfill_sessions():
+    """
+    Build the per-session documents of histories written before they were kept (a
+    one-time migration). Only runs while there are none, and is idempotent, so workers
+    starting together can all run it.
+    """
+    sessions = get_sessions_collection()
+    histories = get_chat_history_collection()
+    if sessions.estimated_document_count() or not histories.estimated_document_count():
+        return
+    pipeline = [
+        # Walks the (SessionId, _id) index, so $first/$last are the oldest/newest message
+        {"$sort": {SESSION_ID_KEY: 1, "_id": 1}},
+        {"$group": {
+            "_id": f"${SESSION_ID_KEY}",
+            "first_id": {"$first": "$_id"},
+            "last_id": {"$last": "$_id"},
+            "message_count": {"$sum": 1},
+            "last_history": {"$last": f"${HISTORY_KEY}"},
+        }},
+    ]
+    for row in histories.aggregate(pipeline, allowDiskUse=True):
+        sessions.replace_one({"_id": row["_id"]}, row, upsert=True)
+    logger.info("Built the session list from existing chat histories")
+
+def ensure_indexes():
+    """
+    Create the indexes session queries rely on. Safe to call on every startup.
+    """
+    settings = get_settings()
+    get_chat_history_collection().create_index([(SESSION_ID_KEY, 1), ("_id", 1)])
+    db = get_mongo_client()[settings.MONGO_INITDB_DATABASE]
+    db[settings.MONGODB_COLLECTION_CHAT_SUMMARIES].create_index(SESSION_ID_KEY, unique=True)
+    get_sessions_collection().create_index([("last_id", -1), ("_id", -1)])
+    _backfill_sessions()
+    logger.info("Chat history indexes are in place")
+
 session_service = SessionService()
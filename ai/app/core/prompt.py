@@ -33,3 +33,18 @@ qa_prompt = ChatPromptTemplate.from_messages(
         ("human", "{input}"),
     ]
 )
+
+# Rolling history summary prompt
+summarize_history_system_prompt = (
+    "Progressively summarize the conversation between a user and an assistant "
+    "that answers questions about the user's documents. Extend the current "
+    "summary with the new lines of conversation, keeping names, numbers and "
+    "topics the user may refer back to. Return only the updated summary, "
+    "in at most 150 words."
+)
+summarize_history_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", summarize_history_system_prompt),
+        ("human", "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}"),
+    ]
+)
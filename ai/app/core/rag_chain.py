@@ -1,44 +1,173 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from app.vector_store.faiss_store import get_vector_store
-from app.config.config import settings
+from app.vector_store.faiss_store import get_vector_store, get_index_path, get_index_version, index_cache
+from app.vector_store.retriever import create_multi_collection_retriever, create_retriever
+from app.config.config import get_settings
 from app.core.memory import session_service
-from app.core.prompt import contextualize_q_prompt, qa_prompt
-from app.core.prompt import contextualize_q_prompt, qa_prompt
-from langchain_classic.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain_classic.chains.combine_documents import create_stuff_documents_chain
+from app.core.prompt import qa_prompt
+from app.core.rewrite import create_standalone_question_chain
+from app.core.semantic_cache import with_semantic_cache
+from app.utils.metrics import LLMStageTimer
+from collections import OrderedDict
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
+import logging
+import threading
 
-def get_rag_chain(collection_name:str=None):
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "gemini-2.5-flash"
+
+# One LLM client (and HTTP connection pool) per process
+_llm = None
+_llm_lock = threading.Lock()
+
+# Times the LLM calls of every chain, by the stage tag on them
+_llm_stage_timer = LLMStageTimer(("question_rewrite", "answer_generation"))
+
+# Assembled chains keyed by index path(s), each with the index paths and vector stores
+# it was built on. A chain holds its stores, so it is dropped as soon as the index
+# cache lets go of one of them; otherwise INDEX_CACHE_MAX_BYTES wouldn't bound memory.
+_chain_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_chain_cache_lock = threading.Lock()
+
+def _drop_chains_for_index(index_path: str):
+    with _chain_cache_lock:
+        for key in [key for key, (paths, _, _) in _chain_cache.items() if index_path in paths]:
+            del _chain_cache[key]
+
+index_cache.add_removal_listener(_drop_chains_for_index)
+
+def create_llm():
+    # Imported here: the Gemini SDK takes seconds to import, which would delay worker start
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=LLM_MODEL, google_api_key=get_settings().GOOGLE_API_KEY)
+
+def get_llm():
     """
-    Create and return the RAG chain with history.
+    Get the shared chat model client.
     """
-    vector_store = get_vector_store(collection_name)
-    try:
-        if not vector_store:
-            return None
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = create_llm()
+    return _llm
 
-        retriever = vector_store.as_retriever()
-        
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=settings.GOOGLE_API_KEY)
+def warm_up_llm():
+    """
+    Import the Gemini SDK and create the client at startup, so the first chat doesn't wait for it.
+    """
+    from langchain_classic.chains.combine_documents import create_stuff_documents_chain  # noqa: F401
+    get_llm()
+    logger.info("LLM client ready")
 
-        history_aware_retriever = create_history_aware_retriever(
-            llm, retriever, contextualize_q_prompt
-        )
+def is_llm_ready() -> bool:
+    """
+    Whether the shared chat model client has been created.
+    """
+    return _llm is not None
 
-        question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-        rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+def build_rag_chain(vector_store, llm, collection_name:str=None):
+    """
+    Assemble the history-aware RAG chain on top of a loaded vector store.
+    """
+    return _assemble_rag_chain(
+        create_retriever(vector_store),
+        llm,
+        get_index_path(collection_name),
+        lambda: get_index_version(collection_name),
+    )
 
-        rag_chain_with_history = RunnableWithMessageHistory(
-            rag_chain,
-            get_session_history=session_service.get_or_create_session_history,
-            input_messages_key="input",
-            history_messages_key="chat_history",
-            output_messages_key="answer",
-        )
+def build_multi_collection_rag_chain(vector_stores, llm):
+    """
+    Assemble the RAG chain over several loaded collections, given as (name, vector store) pairs.
+    """
+    names = [name for name, _ in vector_stores]
+    return _assemble_rag_chain(
+        create_multi_collection_retriever(vector_stores),
+        llm,
+        "+".join(get_index_path(name) for name in names),
+        lambda: tuple(get_index_version(name) for name in names),
+    )
+
+def _assemble_rag_chain(retriever, llm, cache_key: str, get_cache_version):
+    # Only calls the LLM to rewrite follow-up questions that depend on the history
+    standalone_question_chain = create_standalone_question_chain(llm)
+
+    from langchain_classic.chains.combine_documents import create_stuff_documents_chain
+    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt).with_config(tags=["answer_generation"])
+    answer_chain = (
+        RunnablePassthrough.assign(context=itemgetter("standalone_question") | retriever)
+        .assign(answer=question_answer_chain)
+    )
+    if get_settings().SEMANTIC_CACHE_ENABLED:
+        answer_chain = with_semantic_cache(answer_chain, cache_key, get_cache_version)
+    rag_chain = (
+        RunnablePassthrough.assign(standalone_question=standalone_question_chain) | answer_chain
+    ).with_config(run_name="retrieval_chain")
+
+    return RunnableWithMessageHistory(
+        rag_chain,
+        get_session_history=session_service.get_or_create_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+        output_messages_key="answer",
+    ).with_config(callbacks=[_llm_stage_timer])
+
+def _collection_names(collection_name: Optional[str], collections: Optional[Sequence[str]]) -> List[str]:
+    names = [collection_name or "default", *get_settings().SHARED_COLLECTIONS, *(collections or [])]
+    # Keep the first occurrence of each name
+    return list(dict.fromkeys(names))
+
+def _get_cached_chain(index_paths: Tuple[str, ...], vector_stores: tuple, build):
+    key = "+".join(index_paths)
+    with _chain_cache_lock:
+        cached = _chain_cache.get(key)
+        # The index cache hands out a new store object whenever an index changes
+        if cached and len(cached[1]) == len(vector_stores) and all(
+            a is b for a, b in zip(cached[1], vector_stores)
+        ):
+            _chain_cache.move_to_end(key)
+            return cached[2]
 
-        return rag_chain_with_history
+    rag_chain_with_history = build()
+
+    with _chain_cache_lock:
+        # Only cache chains over stores the index cache still holds (and accounts for);
+        # one evicted after this check drops the chain through the removal listener
+        if all(index_cache.holds(path, store) for path, store in zip(index_paths, vector_stores)):
+            _chain_cache[key] = (index_paths, vector_stores, rag_chain_with_history)
+            _chain_cache.move_to_end(key)
+            while len(_chain_cache) > get_settings().RAG_CHAIN_CACHE_SIZE:
+                _chain_cache.popitem(last=False)
+    return rag_chain_with_history
+
+def get_rag_chain(collection_name:str=None, collections: Optional[Sequence[str]] = None):
+    """
+    Return the RAG chain with history for a collection, also searching SHARED_COLLECTIONS
+    and any extra `collections`. Collections without an index are skipped.
+    Chains are cached and only rebuilt when one of the indexes has changed.
+    """
+    names = _collection_names(collection_name, collections)
+    # Loaded indexes come from the index cache, so they are shared with other chains
+    loaded = [(name, get_vector_store(name)) for name in names]
+    loaded = [(name, vector_store) for name, vector_store in loaded if vector_store]
+    try:
+        if not loaded:
+            return None
+
+        index_paths = tuple(get_index_path(name) for name, _ in loaded)
+        vector_stores = tuple(vector_store for _, vector_store in loaded)
+        if len(loaded) == 1:
+            name, vector_store = loaded[0]
+            return _get_cached_chain(
+                index_paths, vector_stores, lambda: build_rag_chain(vector_store, get_llm(), name)
+            )
+        return _get_cached_chain(
+            index_paths, vector_stores, lambda: build_multi_collection_rag_chain(loaded, get_llm())
+        )
     except Exception as e:
         print(f"Error creating RAG chain: {e}")
         return None
@@ -0,0 +1,110 @@
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from typing import Any, Dict, List
+import logging
+import re
+import threading
+from app.config.config import get_settings
+from app.core.prompt import contextualize_q_prompt
+from app.utils.concurrency import run_in_cpu_pool
+from app.utils.metrics import question_rewrites
+
+logger = logging.getLogger(__name__)
+
+# Words and openings that only make sense with the previous turns in mind
+_ANAPHORA_PATTERN = re.compile(
+    r"\b(it|its|it's|they|them|their|theirs|this|that|these|those|he|him|his|she|her|hers"
+    r"|former|latter|same|above|previous|earlier|aforementioned|one|ones|else|more|again)\b"
+    r"|^\s*(and|but|or|so|also|what about|how about|why not|then)\b",
+    re.IGNORECASE,
+)
+
+# Questions this short are usually elliptical follow-ups ("and the price?")
+MIN_STANDALONE_WORDS = 4
+
+class RewriteStats:
+    """
+    Counts how often the question-rewriting LLM call is made or skipped. The counts are
+    also exported on /metrics as rag_question_rewrites_total.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rewritten = 0
+        self.skipped_no_history = 0
+        self.skipped_standalone = 0
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        question_rewrites.inc((outcome,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.rewritten + self.skipped_no_history + self.skipped_standalone
+            return {
+                "policy": get_settings().QUESTION_REWRITE_POLICY,
+                "rewritten": self.rewritten,
+                "skipped_no_history": self.skipped_no_history,
+                "skipped_standalone": self.skipped_standalone,
+                "rewrite_rate": self.rewritten / total if total else None,
+            }
+
+rewrite_stats = RewriteStats()
+
+def _last_human_message(chat_history: List) -> str:
+    for message in reversed(chat_history):
+        if getattr(message, "type", None) == "human":
+            return message.content
+    return ""
+
+def needs_rewrite(question: str, chat_history: List) -> bool:
+    """
+    Decide whether a question must be rewritten into a standalone one before retrieval.
+    """
+    settings = get_settings()
+    if not chat_history:
+        return False
+    policy = settings.QUESTION_REWRITE_POLICY
+    if policy == "always":
+        return True
+    if policy == "never":
+        return False
+
+    if _ANAPHORA_PATTERN.search(question):
+        return True
+    if len(question.split()) < MIN_STANDALONE_WORDS:
+        return True
+
+    threshold = settings.QUESTION_REWRITE_SIMILARITY_THRESHOLD
+    previous = _last_human_message(chat_history)
+    if threshold and previous:
+        # A question close to the previous one continues its topic and may rely on
+        # qualifiers mentioned there
+        from app.core.semantic_cache import embed_question
+        # Normalized embeddings, so the dot product is the cosine similarity. Both are
+        # memoized: the previous question was embedded last turn
+        similarity = float(embed_question(question) @ embed_question(previous))
+        return similarity >= threshold
+    return False
+
+def create_standalone_question_chain(llm):
+    """
+    Runnable mapping {"input", "chat_history"} to a standalone question, calling the LLM
+    only when needs_rewrite says the question depends on the history.
+    """
+    rewrite_chain = (contextualize_q_prompt | llm | StrOutputParser()).with_config(tags=["question_rewrite"])
+
+    def route(inputs: Dict[str, Any]):
+        chat_history = inputs.get("chat_history") or []
+        if needs_rewrite(inputs["input"], chat_history):
+            rewrite_stats.record("rewritten")
+            return rewrite_chain
+        rewrite_stats.record("skipped_standalone" if chat_history else "skipped_no_history")
+        return inputs["input"]
+
+    async def aroute(inputs: Dict[str, Any]):
+        # needs_rewrite may embed: run it on the bounded CPU pool, not the default executor
+        return await run_in_cpu_pool(route, inputs)
+
+    return RunnableLambda(route, afunc=aroute).with_config(run_name="standalone_question")
@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, NamedTuple, Optional
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
+import itertools
+import logging
+import threading
+import time
+import numpy as np
+from app.config.config import get_settings
+from app.utils.concurrency import run_in_cpu_pool
+from app.vector_store.sparse_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+class CachedAnswer(NamedTuple):
+    collection: str
+    question: str
+    identifiers: FrozenSet[str]
+    vector: np.ndarray
+    answer: str
+    context: List[Document]
+    index_version: Hashable
+    created_at: float
+
+class SemanticAnswerCache:
+    """
+    Answers to previous questions per collection, looked up by cosine similarity of
+    the standalone question's embedding. Entries expire after a TTL, are evicted LRU
+    beyond max_entries, and are dropped when the collection's index changes.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        # Unset parameters are read from the settings when used, so the shared cache can
+        # be created at import without loading them
+        self._threshold = threshold
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._by_collection: Dict[str, List[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def threshold(self) -> float:
+        return self._threshold if self._threshold is not None else get_settings().SEMANTIC_CACHE_THRESHOLD
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self._ttl_seconds if self._ttl_seconds is not None else get_settings().SEMANTIC_CACHE_TTL
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries if self._max_entries is not None else get_settings().SEMANTIC_CACHE_MAX_ENTRIES
+
+    def lookup(self, collection: str, vector: np.ndarray, index_version: Hashable,
+               identifiers: FrozenSet[str] = frozenset()) -> Optional[CachedAnswer]:
+        """
+        Best cached answer above the similarity threshold among questions that name
+        exactly the same identifiers: embeddings barely tell "part PN-1001" from
+        "part PN-1002" apart.
+        """
+        with self._lock:
+            self._drop_invalid(collection, index_version, time.monotonic())
+            entry_ids = [
+                entry_id for entry_id in self._by_collection.get(collection, [])
+                if self._entries[entry_id].identifiers == identifiers
+            ]
+            if not entry_ids:
+                self.misses += 1
+                return None
+
+            # Vectors are normalized, so the dot product is the cosine similarity
+            matrix = np.stack([self._entries[entry_id].vector for entry_id in entry_ids])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = entry_ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return self._entries[entry_id]
+
+    def put(self, collection: str, question: str, vector: np.ndarray, answer: str,
+            context: List[Document], index_version: Hashable):
+        entry = CachedAnswer(
+            collection, question, question_identifiers(question), vector, answer, context,
+            index_version, time.monotonic(),
+        )
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._by_collection.setdefault(collection, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._by_collection[evicted.collection].remove(evicted_id)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_collection.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _is_valid(self, entry: CachedAnswer, index_version: Hashable, now: float) -> bool:
+        return entry.index_version == index_version and now - entry.created_at <= self.ttl_seconds
+
+    def _drop_invalid(self, collection: str, index_version: Hashable, now: float):
+        if collection not in self._by_collection:
+            return
+        kept = []
+        for entry_id in self._by_collection.get(collection, []):
+            if self._is_valid(self._entries[entry_id], index_version, now):
+                kept.append(entry_id)
+            else:
+                del self._entries[entry_id]
+                self.invalidations += 1
+        self._by_collection[collection] = kept
+
+def question_identifiers(question: str) -> FrozenSet[str]:
+    """
+    Tokens of a question that name something specific: any with a digit, or compound
+    identifiers such as part numbers, versions, paths and snake_case names.
+    """
+    return frozenset(
+        token for token in tokenize(question)
+        if any(char.isdigit() for char in token) or not token.isalnum()
+    )
+
+def embed_question(question: str) -> np.ndarray:
+    """
+    Embed a question with the shared model, normalized for cosine similarity.
+    """
+    from app.ingestion.embedder import embed_query_cached
+    vector = embed_query_cached(question)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+semantic_cache = SemanticAnswerCache()
+
+def with_semantic_cache(answer_chain, cache_key: str, get_index_version: Callable[[], Hashable]):
+    """
+    Wrap a chain mapping {"standalone_question", ...} to {"context", "answer", ...} so
+    near-identical questions are answered from the cache, skipping retrieval and the LLM.
+    """
+    def lookup(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        vector = embed_question(inputs["standalone_question"])
+        index_version = get_index_version()
+        return {
+            "vector": vector,
+            "index_version": index_version,
+            "hit": semantic_cache.lookup(
+                cache_key, vector, index_version, question_identifiers(inputs["standalone_question"])
+            ),
+        }
+
+    async def alookup(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        # Embedding is CPU-bound: run it on the bounded CPU pool, not the default executor
+        return await run_in_cpu_pool(lookup, inputs)
+
+    def answer_from_cache(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        hit = inputs["semantic_cache"]["hit"]
+        return {**inputs, "context": hit.context, "answer": hit.answer}
+
+    def store(run):
+        # Listener, so the answer can still be streamed token by token
+        outputs = run.outputs or {}
+        lookup_result = outputs.get("semantic_cache")
+        if lookup_result and outputs.get("answer"):
+            semantic_cache.put(
+                cache_key,
+                outputs["standalone_question"],
+                lookup_result["vector"],
+                outputs["answer"],
+                outputs.get("context", []),
+                lookup_result["index_version"],
+            )
+
+    return RunnablePassthrough.assign(
+        semantic_cache=RunnableLambda(lookup, afunc=alookup).with_config(run_name="semantic_cache_lookup")
+    ) | RunnableBranch(
+        (lambda inputs: inputs["semantic_cache"]["hit"] is not None, RunnableLambda(answer_from_cache)),
+        answer_chain.with_listeners(on_end=store),
+    )
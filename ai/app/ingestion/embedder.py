@@ -1,25 +1,153 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+from typing import List
+import atexit
+import functools
 import logging
+import threading
+import numpy as np
 from fastapi import HTTPException
+from app.config.config import get_settings
+from app.utils.metrics import span
 
 logger = logging.getLogger(__name__)
 
-def get_embedder():
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# One embedder per worker process, shared by every request.
+_embedder = None
+_embedder_lock = threading.Lock()
+
+_encode_pool = None
+
+def _get_encode_pool(client):
+    global _encode_pool
+    settings = get_settings()
+    with _embedder_lock:
+        if _encode_pool is None:
+            logger.info(f"Starting {settings.EMBEDDING_MULTI_PROCESS_WORKERS} embedding processes")
+            _encode_pool = client.start_multi_process_pool(
+                ["cpu"] * settings.EMBEDDING_MULTI_PROCESS_WORKERS
+            )
+            atexit.register(client.stop_multi_process_pool, _encode_pool)
+    return _encode_pool
+
+def get_embedding_model_id() -> str:
     """
-    Get the embedding model.
+    Identify the model and backend producing the vectors; quantized backends give
+    slightly different embeddings, so they must not share cache entries.
     """
+    settings = get_settings()
+    if settings.EMBEDDING_BACKEND == "torch":
+        return MODEL_NAME
+    return f"{MODEL_NAME}@{settings.EMBEDDING_BACKEND}"
+
+def _get_model_kwargs() -> dict:
+    settings = get_settings()
+    model_kwargs = {'device': 'cpu'}
+    backend = settings.EMBEDDING_BACKEND
+    if backend == "torch":
+        return model_kwargs
+    if backend not in ("onnx", "onnx-int8"):
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
     try:
-        model_name = "sentence-transformers/all-MiniLM-L6-v2"
-        model_kwargs = {'device': 'cpu'}
-        encode_kwargs = {'normalize_embeddings': False}
-        logger.info(f"Loading embedding model: {model_name}")
-        embedder = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
+        import onnxruntime
+    except ImportError:
+        raise ImportError(
+            "EMBEDDING_BACKEND=onnx requires the ONNX extras: uv pip install 'sentence-transformers[onnx]'"
         )
-        logger.info("Embedding model loaded successfully")
-        return embedder
+    onnx_kwargs = {}
+    if settings.EMBEDDING_NUM_THREADS:
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = settings.EMBEDDING_NUM_THREADS
+        onnx_kwargs["session_options"] = session_options
+    if backend == "onnx-int8":
+        # Quantized export published in the model repository
+        onnx_kwargs["file_name"] = settings.EMBEDDING_ONNX_INT8_FILE
+    model_kwargs["backend"] = "onnx"
+    model_kwargs["model_kwargs"] = onnx_kwargs
+    return model_kwargs
+
+def _embeddings_class():
+    # Imported here: langchain_huggingface loads sentence-transformers and torch, which
+    # takes seconds and would delay every worker start
+    settings = get_settings()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    if settings.EMBEDDING_MULTI_PROCESS_WORKERS <= 0:
+        return HuggingFaceEmbeddings
+
+    class PooledHuggingFaceEmbeddings(HuggingFaceEmbeddings):
+        """
+        HuggingFaceEmbeddings that encodes large batches on a persistent multi-process pool
+        instead of starting (and stopping) a new pool for every call.
+        """
+
+        def embed_documents(self, texts: List[str]) -> List[List[float]]:
+            if len(texts) < settings.EMBEDDING_MULTI_PROCESS_MIN_TEXTS:
+                return super().embed_documents(texts)
+            texts = [text.replace("\n", " ") for text in texts]
+            embeddings = self._client.encode_multi_process(
+                texts, _get_encode_pool(self._client), batch_size=settings.EMBEDDING_BATCH_SIZE
+            )
+            return embeddings.tolist()
+
+    return PooledHuggingFaceEmbeddings
+
+def _load_embedder():
+    settings = get_settings()
+    if settings.EMBEDDING_NUM_THREADS and settings.EMBEDDING_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(settings.EMBEDDING_NUM_THREADS)
+    model_kwargs = _get_model_kwargs()
+    encode_kwargs = {'normalize_embeddings': False, 'batch_size': settings.EMBEDDING_BATCH_SIZE}
+    embeddings_class = _embeddings_class()
+    logger.info(f"Loading embedding model: {get_embedding_model_id()}")
+    embedder = embeddings_class(
+        model_name=MODEL_NAME,
+        model_kwargs=model_kwargs,
+        encode_kwargs=encode_kwargs
+    )
+    logger.info("Embedding model loaded successfully")
+    return embedder
+
+def get_embedder():
+    """
+    Get the shared embedding model, loading it on first use.
+    """
+    global _embedder
+    if _embedder is not None:
+        return _embedder
+    try:
+        with _embedder_lock:
+            # Another thread may have finished loading while we waited
+            if _embedder is None:
+                _embedder = _load_embedder()
+        return _embedder
     except Exception as e:
         logger.error(f"Error loading embedder: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@functools.lru_cache(maxsize=1024)
+def embed_query_cached(text: str) -> np.ndarray:
+    """
+    Embed a query with the shared model. Recent queries are memoized, so the rewrite
+    check, the semantic cache lookup and retrieval embed a question once.
+    """
+    with span("embedding"):
+        vector = np.asarray(get_embedder().embed_query(text), dtype=np.float32)
+    # Shared between callers through the memo
+    vector.flags.writeable = False
+    return vector
+
+def warm_up_embedder():
+    """
+    Load the embedding model and run a dummy query so the first request doesn't pay for it.
+    """
+    embedder = get_embedder()
+    embedder.embed_query("warm up")
+    logger.info("Embedding model warmed up")
+
+def is_embedder_ready() -> bool:
+    """
+    Whether the shared embedding model has been loaded.
+    """
+    return _embedder is not None
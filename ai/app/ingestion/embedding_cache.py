@@ -0,0 +1,129 @@
+from typing import List, Optional, Sequence, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+from app.config.config import get_settings
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace so chunks that differ only in PDF layout share a cache entry.
+    """
+    return " ".join(text.split())
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, normalized chunk text hash)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets several worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vectors in the order of texts, None for misses"""
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound parameter limit
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                found.update(rows)
+        return [
+            np.frombuffer(found[h], dtype=np.float32).tolist() if h in found else None
+            for h in hashes
+        ]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        rows = [
+            (model, text_hash(text), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Get the shared embedding cache, or None if it is disabled.
+    """
+    global _cache
+    settings = get_settings()
+    if not settings.EMBEDDING_CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH)
+    return _cache
+
+def lookup_embeddings(texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], List[int]]:
+    """
+    Return cached vectors for texts (None where missing) and the indices that still
+    need embedding.
+    """
+    from app.ingestion.embedder import get_embedding_model_id
+    cache = get_embedding_cache()
+    if cache is None:
+        return [None] * len(texts), list(range(len(texts)))
+    try:
+        vectors = cache.get_many(get_embedding_model_id(), texts)
+    except sqlite3.Error as e:
+        logger.warning(f"Embedding cache lookup failed: {e}")
+        vectors = [None] * len(texts)
+    return vectors, [i for i, vector in enumerate(vectors) if vector is None]
+
+def store_embeddings(texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+    from app.ingestion.embedder import get_embedding_model_id
+    cache = get_embedding_cache()
+    if cache is None or not texts:
+        return
+    try:
+        cache.put_many(get_embedding_model_id(), texts, vectors)
+    except sqlite3.Error as e:
+        logger.warning(f"Embedding cache write failed: {e}")
+
+def embed_documents_cached(texts: Sequence[str]) -> Tuple[List[List[float]], int]:
+    """
+    Embed texts, computing only the ones missing from the cache.
+    Returns the vectors and the number of cache hits.
+    """
+    from app.ingestion.embedder import get_embedder
+    vectors, missing = lookup_embeddings(texts)
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        with span("embedding"):
+            computed = get_embedder().embed_documents(missing_texts)
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+        store_embeddings(missing_texts, computed)
+    return vectors, len(texts) - len(missing)
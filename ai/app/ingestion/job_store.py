@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+from app.config.config import get_settings
+from app.models.job import JobStatus
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STAGES = ("completed", "failed")
+
+class JobStatusStore:
+    """
+    Ingestion job status shared by all uvicorn workers through MongoDB, so /jobs/{job_id}
+    answers whichever worker the poll lands on, and the queue depth is enforced across
+    workers. Each job document carries a heartbeat; jobs of a worker that died stop
+    counting against the queue once it is older than INGESTION_JOB_LEASE_SECONDS.
+
+    MongoDB errors are logged and never fail a job: the worker running it still has its
+    status in memory.
+    """
+
+    def _collection(self):
+        settings = get_settings()
+        from app.core.memory import get_mongo_client
+        return get_mongo_client()[settings.MONGO_INITDB_DATABASE][settings.MONGODB_COLLECTION_INGESTION_JOBS]
+
+    def ensure_indexes(self):
+        collection = self._collection()
+        # Finished (or abandoned) jobs are removed after INGESTION_JOB_TTL_SECONDS
+        collection.create_index("heartbeat", expireAfterSeconds=get_settings().INGESTION_JOB_TTL_SECONDS)
+        collection.create_index("stage")
+
+    def active_jobs(self) -> Optional[int]:
+        """Jobs queued or running on any worker, or None if MongoDB can't be reached"""
+        lease_start = datetime.now(timezone.utc) - timedelta(seconds=get_settings().INGESTION_JOB_LEASE_SECONDS)
+        try:
+            return self._collection().count_documents(
+                {"stage": {"$nin": list(FINISHED_STAGES)}, "heartbeat": {"$gt": lease_start}}
+            )
+        except Exception as e:
+            logger.warning(f"Could not count active ingestion jobs: {e}")
+            return None
+
+    def save(self, job: JobStatus):
+        try:
+            self._collection().replace_one(
+                {"_id": job.job_id},
+                {**job.model_dump(), "heartbeat": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Could not save ingestion job {job.job_id}: {e}")
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        try:
+            document = self._collection().find_one({"_id": job_id})
+        except Exception as e:
+            logger.warning(f"Could not read ingestion job {job_id}: {e}")
+            return None
+        if document is None:
+            return None
+        document.pop("_id", None)
+        document.pop("heartbeat", None)
+        return JobStatus(**document)
+
+job_status_store = JobStatusStore()
@@ -0,0 +1,294 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+import multiprocessing
+import logging
+import os
+import threading
+import time
+import uuid
+from langchain_core.documents import Document
+from app.config.config import get_settings
+from app.ingestion.job_store import FINISHED_STAGES, job_status_store
+from app.models.job import JobStatus
+from app.utils.metrics import record, timed_call, trace
+
+logger = logging.getLogger(__name__)
+
+# Progress counters are written to the shared job store at most this often (seconds)
+PUBLISH_INTERVAL = 1.0
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue has no room for another job"""
+
+# Runs in the worker processes, so it must be an importable module-level function.
+# HTTPExceptions raised by the embedder are turned into plain errors so they survive
+# pickling back to the parent.
+def _embed(texts: List[str]) -> List[List[float]]:
+    from app.ingestion.embedder import get_embedder
+    try:
+        return get_embedder().embed_documents(texts)
+    except Exception as e:
+        raise RuntimeError(getattr(e, "detail", str(e)))
+
+def _init_worker_process():
+    # The worker processes are the parallelism; an encode pool in each would oversubscribe the CPUs
+    get_settings().EMBEDDING_MULTI_PROCESS_WORKERS = 0
+
+def _embed_batch_size() -> int:
+    settings = get_settings()
+    if settings.INGESTION_PROCESSES == 0 and settings.EMBEDDING_MULTI_PROCESS_WORKERS > 0:
+        # Inline embedding only uses the encode pool for batches this large
+        return max(settings.INGESTION_EMBED_BATCH_SIZE, settings.EMBEDDING_MULTI_PROCESS_MIN_TEXTS)
+    return settings.INGESTION_EMBED_BATCH_SIZE
+
+class _InlineExecutor(Executor):
+    """Runs work in the calling thread, used when INGESTION_PROCESSES is 0"""
+
+    def submit(self, fn, *args, **kwargs):
+        from concurrent.futures import Future
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+class IngestionJobManager:
+    """Runs PDF ingestion (load -> split -> embed -> index) in the background"""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, JobStatus]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._runner: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[Executor] = None
+        # When each job's status was last written to the shared store
+        self._published: Dict[str, float] = {}
+
+    def _executors(self):
+        # Created on first use so importing the app doesn't spawn processes or load settings
+        settings = get_settings()
+        with self._lock:
+            if self._runner is None:
+                self._slots = threading.BoundedSemaphore(settings.INGESTION_QUEUE_DEPTH)
+                self._runner = ThreadPoolExecutor(
+                    max_workers=settings.INGESTION_WORKERS, thread_name_prefix="ingestion"
+                )
+                if settings.INGESTION_PROCESSES > 0:
+                    # spawn: forking a process that already runs torch threads can deadlock
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=settings.INGESTION_PROCESSES,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker_process,
+                    )
+                else:
+                    self._pool = _InlineExecutor()
+            return self._runner, self._pool
+
+    def submit(self, file_path: str, filename: str, session_id: Optional[str]) -> JobStatus:
+        """
+        Queue a saved PDF for ingestion. The job owns the file and removes it when done.
+        """
+        settings = get_settings()
+        runner, _ = self._executors()
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Ingestion queue is full, try again later")
+        if settings.INGESTION_JOBS_SHARED:
+            # The queue depth also holds across uvicorn workers
+            active = job_status_store.active_jobs()
+            if active is not None and active >= settings.INGESTION_QUEUE_DEPTH:
+                self._slots.release()
+                raise QueueFullError("Ingestion queue is full, try again later")
+
+        now = _now()
+        job = JobStatus(
+            job_id=str(uuid.uuid4()),
+            session_id=session_id,
+            filename=filename,
+            created_at=now,
+            updated_at=now,
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._forget_old_jobs()
+        self._publish(job.job_id, force=True)
+
+        try:
+            future = runner.submit(self._run, job.job_id, file_path)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._cleanup_cancelled(f, job.job_id, file_path))
+        return job.model_copy()
+
+    def _cleanup_cancelled(self, future, job_id: str, file_path: str):
+        # A job cancelled before it started (at shutdown) never runs the cleanup in _run_job
+        if not future.cancelled():
+            return
+        self._update(job_id, stage="failed", error="The server shut down before the job started")
+        self._slots.release()
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        """Status of a job run by this worker or, with INGESTION_JOBS_SHARED, any other one"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.model_copy()
+        return job_status_store.get(job_id) if get_settings().INGESTION_JOBS_SHARED else None
+
+    def shutdown(self):
+        with self._lock:
+            runner, pool = self._runner, self._pool
+        if runner:
+            runner.shutdown(wait=False, cancel_futures=True)
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for key, value in changes.items():
+                setattr(job, key, value)
+            job.updated_at = _now()
+        self._publish(job_id, force=True)
+
+    def _increment(self, job_id: str, field: str, amount: int):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            setattr(job, field, getattr(job, field) + amount)
+            job.updated_at = _now()
+        self._publish(job_id)
+
+    def _publish(self, job_id: str, force: bool = False):
+        """Write the job's status to the shared store; progress updates are throttled"""
+        if not get_settings().INGESTION_JOBS_SHARED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (not force and now - self._published.get(job_id, 0) < PUBLISH_INTERVAL):
+                return
+            self._published[job_id] = now
+            job = job.model_copy()
+        job_status_store.save(job)
+
+    def _track_pages(self, job_id: str, pages: Iterator[Document]) -> Iterator[Document]:
+        for page in pages:
+            self._increment(job_id, "pages_processed", 1)
+            yield page
+
+    def _run(self, job_id: str, file_path: str):
+        # Stage timings of the job are logged under its job id
+        with trace("ingestion", job_id) as active:
+            self._run_job(job_id, file_path)
+            job = self.get(job_id)
+            if active is not None and job is not None:
+                active.fields.update(stage=job.stage, pages=job.total_pages, chunks=job.chunks_total)
+
+    def _run_job(self, job_id: str, file_path: str):
+        settings = get_settings()
+        from app.ingestion.loader import count_pdf_pages, iter_pdf_pages
+        from app.ingestion.splitter import iter_chunk_batches
+        from app.ingestion.embedding_cache import lookup_embeddings, store_embeddings
+        from app.vector_store.faiss_store import (
+            commit_pending_segments, stage_embedded_documents, start_pending_segments,
+        )
+
+        _, pool = self._executors()
+        job = self.get(job_id)
+        # Enough pending work to keep every worker process busy
+        max_in_flight = max(1, settings.INGESTION_PROCESSES) * 2
+        # Embedded batches are written to disk as they arrive, so memory stays bounded by
+        # the batches in flight, and committed to the index once, at the end: a failed
+        # job leaves nothing behind and re-uploading the file can't duplicate chunks
+        staged = None
+        pending = deque()
+
+        def collect_next_batch():
+            batch, vectors, missing, future = pending.popleft()
+            if future is not None:
+                seconds, computed = future.result()
+                record("embedding", seconds)
+                for i, vector in zip(missing, computed):
+                    vectors[i] = vector
+                store_embeddings([batch[i].page_content for i in missing], computed)
+            stage_embedded_documents(staged, batch, vectors)
+            self._increment(job_id, "chunks_embedded", len(batch))
+
+        try:
+            self._update(job_id, stage="loading", total_pages=count_pdf_pages(file_path))
+            staged = start_pending_segments(job.session_id)
+            # Pages are extracted in parallel and split as they arrive; chunk batches are
+            # embedded while later pages are still being extracted
+            pages = self._track_pages(job_id, iter_pdf_pages(
+                file_path,
+                pool,
+                source=job.filename,
+                pages_per_task=settings.INGESTION_PAGES_PER_TASK,
+                max_in_flight=max_in_flight,
+            ))
+            for number, batch in enumerate(iter_chunk_batches(pages, _embed_batch_size())):
+                if number == 0:
+                    # Stage changes are published at once; per-batch counters are throttled
+                    self._update(job_id, stage="embedding")
+                self._increment(job_id, "chunks_total", len(batch))
+                # Only chunks missing from the embedding cache go to the workers
+                vectors, missing = lookup_embeddings([c.page_content for c in batch])
+                self._increment(job_id, "embedding_cache_hits", len(batch) - len(missing))
+                future = pool.submit(timed_call, _embed, [batch[i].page_content for i in missing]) if missing else None
+                pending.append((batch, vectors, missing, future))
+                while len(pending) >= max_in_flight:
+                    collect_next_batch()
+            while pending:
+                collect_next_batch()
+
+            self._update(job_id, stage="indexing")
+            commit_pending_segments(staged, job.session_id)
+            job = self.get(job_id)
+            hit_ratio = job.embedding_cache_hits / job.chunks_total if job.chunks_total else None
+            outcome = {"stage": "completed", "embedding_cache_hit_ratio": hit_ratio}
+            logger.info(
+                f"Ingestion job {job_id} completed: {job.chunks_total} chunks, "
+                f"embedding cache hit ratio {hit_ratio or 0:.2f}"
+            )
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            outcome = {"stage": "failed", "error": getattr(e, "detail", str(e))}
+        finally:
+            for *_, future in pending:
+                if future is not None:
+                    future.cancel()
+            if staged is not None:
+                # Nothing left after a commit; the partial upload after a failure
+                staged.discard()
+            self._slots.release()
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        # Reported once the job has cleaned up and freed its slot
+        self._update(job_id, **outcome)
+
+    def _forget_old_jobs(self):
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.stage in FINISHED_STAGES
+        ]
+        for job_id in finished[:max(0, len(finished) - get_settings().INGESTION_JOB_HISTORY)]:
+            del self._jobs[job_id]
+            self._published.pop(job_id, None)
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+job_manager = IngestionJobManager()
@@ -1,8 +1,12 @@
 from langchain_community.document_loaders import PyPDFLoader
-from typing import List
+from concurrent.futures import Executor
+from collections import deque
+from typing import Iterator, List, Optional
 from langchain_core.documents import Document
 import logging
+import pypdf
 from fastapi import HTTPException
+from app.utils.metrics import record, span, timed_call
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +17,65 @@ def load_pdf(file_path: str) -> List[Document]:
     try:
         logger.info(f"Loading PDF from {file_path}")
         loader = PyPDFLoader(file_path)
-        documents = loader.load()
+        with span("pdf_parse"):
+            documents = loader.load()
         logger.info(f"Loaded {len(documents)} documents from {file_path}")
         return documents
     except Exception as e:
         logger.error(f"Error loading PDF from {file_path}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+def count_pdf_pages(file_path: str) -> int:
+    """
+    Number of pages in a PDF, without extracting any text.
+    """
+    return len(pypdf.PdfReader(file_path).pages)
+
+def extract_pdf_pages(file_path: str, start: int, end: int, source: Optional[str] = None) -> List[Document]:
+    """
+    Extract pages [start, end) as one document per page, with the same metadata
+    PyPDFLoader produces. Runs in ingestion worker processes.
+    """
+    reader = pypdf.PdfReader(file_path)
+    total_pages = len(reader.pages)
+    # Computed for the whole document on each access
+    labels = reader.page_labels
+    documents = []
+    for page_number in range(start, min(end, total_pages)):
+        documents.append(Document(
+            page_content=reader.pages[page_number].extract_text().strip(),
+            metadata={
+                "source": source or file_path,
+                "total_pages": total_pages,
+                "page": page_number,
+                "page_label": labels[page_number],
+            },
+        ))
+    return documents
+
+def iter_pdf_pages(
+    file_path: str,
+    executor: Executor,
+    source: Optional[str] = None,
+    pages_per_task: int = 8,
+    max_in_flight: int = 4,
+) -> Iterator[Document]:
+    """
+    Yield the pages of a PDF in order while extracting them in parallel on an executor.
+    At most max_in_flight page ranges are pending at once, so memory stays bounded
+    regardless of document size.
+    """
+    total_pages = count_pdf_pages(file_path)
+    logger.info(f"Streaming {total_pages} pages from {file_path}")
+    pending = deque()
+    next_start = 0
+    while next_start < total_pages or pending:
+        while next_start < total_pages and len(pending) < max_in_flight:
+            pending.append(executor.submit(
+                timed_call, extract_pdf_pages, file_path, next_start, next_start + pages_per_task, source
+            ))
+            next_start += pages_per_task
+        # Timed in the worker, so queueing isn't counted as parsing
+        seconds, pages = pending.popleft().result()
+        record("pdf_parse", seconds)
+        yield from pages
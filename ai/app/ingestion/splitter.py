@@ -1,26 +1,48 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
+from typing import Iterable, Iterator, List
 from langchain_core.documents import Document
-from app.config.config import settings
+from app.config.config import get_settings
+from app.utils.metrics import span
 from fastapi import HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _get_text_splitter() -> RecursiveCharacterTextSplitter:
+    settings = get_settings()
+    return RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
 def split_documents(documents: List[Document]) -> List[Document]:
     """
     Split documents into smaller chunks.
     """
     try:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-            length_function=len,
-            is_separator_regex=False,
-        )
-        chunks = text_splitter.split_documents(documents)   
+        text_splitter = _get_text_splitter()
+        with span("split"):
+            chunks = text_splitter.split_documents(documents)
         logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks")
         return chunks
     except Exception as e:
         logger.error(f"Error splitting documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+def iter_chunk_batches(documents: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    """
+    Split documents as they arrive and yield their chunks in batches of batch_size
+    (the last batch may be smaller).
+    """
+    text_splitter = _get_text_splitter()
+    batch = []
+    for document in documents:
+        with span("split"):
+            batch.extend(text_splitter.split_documents([document]))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
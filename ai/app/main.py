@@ -1,13 +1,67 @@
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 from fastapi import FastAPI
-from app.api.routes import document, chat, session
-import app.utils.logger # Initialize logger
+from app.api.routes import document, chat, session, system, jobs
+from app.ingestion.embedder import warm_up_embedder
+from app.ingestion.jobs import job_manager
+from app.ingestion.job_store import job_status_store
+from app.core.memory import ensure_indexes
+from app.core.rag_chain import warm_up_llm
+from app.utils.logger import setup_logger
+from app.utils.metrics import RequestMetricsMiddleware
+from app.config.config import get_settings
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+async def _warm_up():
+    try:
+        await asyncio.to_thread(warm_up_embedder)
+    except Exception as e:
+        # Requests will retry loading lazily; /ready keeps reporting not ready
+        logger.error(f"Error warming up embedder: {e}")
+
+async def _warm_up_llm():
+    try:
+        await asyncio.to_thread(warm_up_llm)
+    except Exception as e:
+        logger.error(f"Error warming up LLM client: {e}")
+
+async def _ensure_indexes():
+    try:
+        await asyncio.to_thread(ensure_indexes)
+        if get_settings().INGESTION_JOBS_SHARED:
+            await asyncio.to_thread(job_status_store.ensure_indexes)
+    except Exception as e:
+        # Queries still work without the indexes, only slower; sessions written before the
+        # session list existed are listed once a later start builds it
+        logger.error(f"Error creating MongoDB indexes: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Settings are loaded here rather than at import
+    setup_logger()
+    # Heavy ML/LLM libraries are imported by the warm-up, in the background, so the
+    # health route answers immediately
+    startup_tasks = [
+        asyncio.create_task(_warm_up()),
+        asyncio.create_task(_warm_up_llm()),
+        asyncio.create_task(_ensure_indexes()),
+    ]
+    yield
+    for task in startup_tasks:
+        task.cancel()
+    job_manager.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Hello from RAG Chat AI!"}
 
 app.include_router(document.router, tags=["Documents"])
+app.include_router(jobs.router, tags=["Documents"])
 app.include_router(chat.router, tags=["Chat"])
 app.include_router(session.router, tags=["Sessions"])
+app.include_router(system.router, tags=["System"])
@@ -1,10 +1,20 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, Any, Dict, List, Optional
+
+CollectionName = Annotated[str, Field(pattern=r"^[A-Za-z0-9_-]+$", max_length=128)]
 
 class ChatRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
+    # Other collections (e.g. other sessions' uploads) to search besides this session's
+    collections: Optional[List[CollectionName]] = Field(default=None, max_length=16)
 
 class ChatResponse(BaseModel):
     answer: str
     session_id: str
+
+class Source(BaseModel):
+    source: Optional[str] = None
+    page: Optional[int] = None
+    content: str
+    metadata: Dict[str, Any] = {}
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class JobStatus(BaseModel):
+    job_id: str
+    session_id: Optional[str] = None
+    filename: str
+    # queued, loading, embedding, indexing, completed, failed
+    # (pages are split as they are loaded, so there is no separate splitting stage)
+    stage: str = "queued"
+    total_pages: int = 0
+    pages_processed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    # Chunks whose embedding was found in the embedding cache
+    embedding_cache_hits: int = 0
+    embedding_cache_hit_ratio: Optional[float] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
@@ -0,0 +1,48 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import contextvars
+import functools
+import threading
+from app.config.config import get_settings
+
+# Bounded pool for CPU-bound work (embedding, FAISS search, index loading) so it
+# runs off the event loop without spawning unbounded threads
+_cpu_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor_lock = threading.Lock()
+
+# Limits how many chat requests run the chain at once per worker
+_chat_semaphore: Optional[asyncio.Semaphore] = None
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Get the shared CPU pool, created on first use so importing the app stays cheap"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _cpu_executor_lock:
+            if _cpu_executor is None:
+                _cpu_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().CPU_POOL_WORKERS, thread_name_prefix="cpu-pool"
+                )
+    return _cpu_executor
+
+def get_chat_semaphore() -> asyncio.Semaphore:
+    """Get the per-worker chat concurrency limit (only used from the event loop)"""
+    global _chat_semaphore
+    if _chat_semaphore is None:
+        _chat_semaphore = asyncio.Semaphore(get_settings().CHAT_MAX_CONCURRENCY)
+    return _chat_semaphore
+
+async def run_in_cpu_pool(func, *args, **kwargs):
+    """
+    Run a blocking function in the CPU thread pool and await its result. The function
+    sees the caller's context variables (e.g. the request trace).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+def submit_to_cpu_pool(func, *args, **kwargs) -> Future:
+    """
+    Submit a blocking function to the CPU thread pool with the caller's context variables.
+    """
+    return get_cpu_executor().submit(contextvars.copy_context().run, func, *args, **kwargs)
@@ -1,13 +1,13 @@
 import logging
 import sys
-from app.config.config import settings
+from app.config.config import get_settings
 
 def setup_logger():
     """
     Configure the root logger based on the LOG_LEVEL environment variable.
     Levels: none, error, warn, info, debug
     """
-    log_level_str = settings.LOG_LEVEL.lower()
+    log_level_str = get_settings().LOG_LEVEL.lower()
     
     # Map string levels to logging constants
     # "none" is handled by setting level to CRITICAL + 1
@@ -38,4 +38,11 @@ def setup_logger():
     else:
         logging.disable(logging.NOTSET)
 
-setup_logger()
+    # Per-request timings (REQUEST_LOG_ENABLED) are bare JSON lines at any LOG_LEVEL but
+    # "none", which disables all logging
+    request_handler = logging.StreamHandler(sys.stdout)
+    request_handler.setFormatter(logging.Formatter("%(message)s"))
+    request_logger = logging.getLogger("app.requests")
+    request_logger.handlers = [request_handler]
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
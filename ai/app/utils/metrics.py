@@ -0,0 +1,290 @@
+"""
+Stage timing spans, exported as Prometheus histograms on /metrics and optionally
+logged as one JSON line per request.
+
+Each HTTP request and ingestion job is a trace, sampled with METRICS_SAMPLE_RATE.
+Spans inside an unsampled trace cost one context variable lookup. Metrics are per
+process, so with several uvicorn workers each one reports its own.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from langchain_core.callbacks import BaseCallbackHandler
+from app.config.config import get_settings
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+
+# Stages timed across the app:
+#   index_load, embedding, faiss_search, bm25_search, question_rewrite,
+#   answer_generation, history_read, history_write, pdf_parse, split, index_save
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Cumulative Prometheus histogram with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], seconds: float):
+        # Per series: one count per bucket (the last is +Inf), then the sum
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += seconds
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """(count, sum) per label set"""
+        with self._lock:
+            return {labels: (int(sum(values[:-1])), values[-1]) for labels, values in self._series.items()}
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+class Counter:
+    """Prometheus counter with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, value in sorted(series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def totals(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._series)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+stage_duration = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each processing stage", ("stage",)
+)
+request_duration = Histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+
+# Not sampled: every routing decision counts
+question_rewrites = Counter(
+    "rag_question_rewrites_total",
+    "Follow-up questions rewritten by the LLM or passed through, by outcome",
+    ("outcome",),
+)
+
+def render_metrics() -> str:
+    return stage_duration.render() + request_duration.render() + question_rewrites.render()
+
+class Trace:
+    """Stage timings collected for one request or ingestion job"""
+
+    def __init__(self, kind: str, request_id: str):
+        self.kind = kind
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.fields: Dict[str, Any] = {}
+        self.stages: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                stage: {"count": count, "ms": round(seconds * 1000, 3)}
+                for stage, (count, seconds) in self.stages.items()
+            }
+        return {
+            "request_id": self.request_id,
+            "kind": self.kind,
+            **self.fields,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages": stages,
+        }
+
+# Marks work inside an unsampled trace
+_UNSAMPLED = object()
+_current_trace: ContextVar[Any] = ContextVar("current_trace", default=None)
+
+def _sample() -> bool:
+    rate = get_settings().METRICS_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+def current_trace() -> Optional[Trace]:
+    trace = _current_trace.get()
+    return trace if isinstance(trace, Trace) else None
+
+@contextmanager
+def trace(kind: str, request_id: Optional[str] = None) -> Iterator[Optional[Trace]]:
+    """
+    Collect the spans of a request or job, if it is sampled. Yields the trace (or None)
+    so callers can attach fields to the JSON log line.
+    """
+    active = Trace(kind, request_id or str(uuid.uuid4())) if _sample() else None
+    token = _current_trace.set(active if active is not None else _UNSAMPLED)
+    try:
+        yield active
+    finally:
+        _current_trace.reset(token)
+        if active is not None and get_settings().REQUEST_LOG_ENABLED:
+            request_logger.info(json.dumps(active.to_dict()))
+
+def _should_record() -> bool:
+    current = _current_trace.get()
+    # Outside any request or job (e.g. warm-up), sample each span on its own
+    return current is not _UNSAMPLED and (current is not None or _sample())
+
+def _observe(stage: str, seconds: float, target: Any):
+    stage_duration.observe((stage,), seconds)
+    if isinstance(target, Trace):
+        target.add(stage, seconds)
+
+def record(stage: str, seconds: float):
+    """Record a span measured elsewhere, e.g. in a worker process"""
+    if _should_record():
+        _observe(stage, seconds, _current_trace.get())
+
+@contextmanager
+def span(stage: str):
+    """Time a block of code as one occurrence of a stage"""
+    if not _should_record():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(stage, time.perf_counter() - started, _current_trace.get())
+
+def timed_call(func, *args, **kwargs) -> Tuple[float, Any]:
+    """
+    Call a function and return (seconds, result). Submitted to worker processes, whose
+    spans the parent records with `record`.
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+class LLMStageTimer(BaseCallbackHandler):
+    """
+    Times chat model calls tagged with a stage name (e.g. via
+    `.with_config(tags=["answer_generation"])`), including streamed ones.
+    """
+
+    run_inline = True
+
+    def __init__(self, stages: Sequence[str]):
+        self.stages = frozenset(stages)
+        self._runs: Dict[UUID, Tuple[str, float, Any]] = {}
+
+    def _start(self, run_id: UUID, tags: Optional[List[str]]):
+        stage = next((tag for tag in tags or () if tag in self.stages), None)
+        if stage is not None and _should_record():
+            self._runs[run_id] = (stage, time.perf_counter(), _current_trace.get())
+
+    def _end(self, run_id: UUID):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            stage, started, target = run
+            _observe(stage, time.perf_counter() - started, target)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, tags=None, **kwargs):
+        self._start(run_id, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, tags=None, **kwargs):
+        self._start(run_id, tags)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._end(run_id)
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware tracing every HTTP request, including streamed response bodies.
+    The request id is taken from X-Request-ID when present and echoed back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:128] or str(uuid.uuid4())
+        status = {"code": 500}
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        started = time.perf_counter()
+        with trace("http", request_id) as active:
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                # The matched route template keeps the label set small
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                request_duration.observe(
+                    (scope["method"], route, str(status["code"])), time.perf_counter() - started
+                )
+                if active is not None:
+                    active.fields.update(method=scope["method"], route=route, status=status["code"])
@@ -0,0 +1,79 @@
+from collections.abc import MutableMapping
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+from typing import Dict, Iterator, Union
+from app.vector_store.segment_store import ChunkLog
+
+class ChunkDeletionError(ValueError):
+    """Raised when deleting chunks from a collection, whose chunk log is append-only"""
+
+    def __init__(self):
+        super().__init__("Chunks can't be deleted one by one: the collection's chunk log is append-only")
+
+class ChunkLogDocstore(Docstore, AddableMixin):
+    """
+    Docstore reading committed chunks on demand from the memory-mapped chunk log, so
+    loading a collection doesn't copy every chunk text into each worker process.
+    Committed chunks are keyed by their position; documents added afterwards are kept
+    in memory until the collection is next loaded.
+    """
+
+    def __init__(self, chunks: ChunkLog, added: Dict[str, Document] = None):
+        self._chunks = chunks
+        # Only the in-memory part, which is what the index cache should count
+        self._dict: Dict[str, Document] = dict(added or {})
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        if isinstance(search, int) and 0 <= search < len(self._chunks):
+            record = self._chunks.record(search)
+            return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+        if search in self._dict:
+            return self._dict[search]
+        return f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = set(texts).intersection(self._dict)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._dict.update(texts)
+
+    def delete(self, ids) -> None:
+        raise ChunkDeletionError()
+
+    def copy(self) -> "ChunkLogDocstore":
+        return ChunkLogDocstore(self._chunks, self._dict)
+
+class PositionalIdMap(MutableMapping):
+    """
+    index_to_docstore_id for a ChunkLogDocstore: committed vectors map to their own
+    position, so no per-vector id table is held in memory.
+    """
+
+    def __init__(self, committed: int, added: Dict[int, str] = None):
+        self._committed = committed
+        self._added: Dict[int, str] = dict(added or {})
+
+    def __getitem__(self, position) -> Union[int, str]:
+        position = int(position)
+        if 0 <= position < self._committed:
+            return position
+        return self._added[position]
+
+    def __setitem__(self, position, doc_id):
+        position = int(position)
+        if position < self._committed:
+            raise KeyError(f"Position {position} belongs to a committed chunk")
+        self._added[position] = doc_id
+
+    def __delitem__(self, position):
+        raise ChunkDeletionError()
+
+    def __iter__(self) -> Iterator[int]:
+        yield from range(self._committed)
+        yield from self._added
+
+    def __len__(self) -> int:
+        return self._committed + len(self._added)
+
+    def copy(self) -> "PositionalIdMap":
+        return PositionalIdMap(self._committed, self._added)
@@ -1,54 +1,276 @@
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
-from typing import List
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 import os
+import uuid
+import numpy as np
 from app.ingestion.embedder import get_embedder
+from app.ingestion.embedding_cache import embed_documents_cached
+from app.vector_store.index_cache import IndexCache
+from app.vector_store import segment_store
+from app.vector_store.sparse_index import SparseIndex
+from app.vector_store.index_factory import (
+    add_to_index,
+    build_faiss_index,
+    copy_index,
+    get_index_type,
+    needs_rebuild,
+    new_faiss_store,
+    read_index_snapshot,
+    write_index_snapshot,
+)
+from app.config.config import get_settings
+from app.utils.metrics import span
 import logging
 from fastapi import HTTPException
 
+# langchain_community (the FAISS store, and the Docstore base of chunk_docstore) is
+# imported where used, like faiss in index_factory
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
 logger = logging.getLogger(__name__)
 
 # Path to the FAISS index (ai/faiss_index/)
 INDEX_PATH = "faiss_index"
 
+# Loaded indexes shared across requests, keyed by index path
+index_cache = IndexCache()
+
 def get_index_path(collection_name:str=None):
     if collection_name:
         return os.path.join(INDEX_PATH, collection_name)
     return os.path.join(INDEX_PATH, "default")
 
+def get_index_version(collection_name:str=None) -> Optional[Tuple[int, int]]:
+    """
+    Identify the on-disk version of a collection's index, or None if it doesn't exist.
+    Every write replaces the manifest (or index.faiss for legacy indexes), so its
+    mtime and size change.
+    """
+    index_path = get_index_path(collection_name)
+    for name in (segment_store.MANIFEST_FILE, "index.faiss"):
+        try:
+            stat = os.stat(os.path.join(index_path, name))
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            continue
+    return None
+
+def _snapshot_is_current(snapshot: Optional[Dict[str, Any]], index_type: str, total: int) -> bool:
+    settings = get_settings()
+    return (
+        snapshot is not None
+        and snapshot["index_type"] == index_type
+        and snapshot["metric"] == settings.FAISS_METRIC
+        # Snapshotted while still too small to train as IVF-PQ
+        and not (index_type == "ivfpq" and snapshot["count"] < settings.FAISS_IVF_TRAIN_THRESHOLD <= total)
+    )
+
+def _should_compact(manifest: Dict[str, Any], index_type: str) -> bool:
+    settings = get_settings()
+    snapshot = manifest.get("snapshot")
+    if snapshot is not None and not _snapshot_is_current(snapshot, index_type, segment_store.committed_count(manifest)):
+        return True
+    # Growing the threshold with the snapshot keeps total rebuild work linear
+    covered = snapshot["count"] if snapshot else 0
+    snapshot_delta = max(settings.INDEX_SNAPSHOT_MIN_VECTORS, covered // 4)
+    return segment_store.needs_compaction(manifest, settings.INDEX_COMPACTION_SEGMENTS, snapshot_delta)
+
+def _load_segment_store(index_path: str, manifest: Dict[str, Any], index_type: str) -> "FAISS":
+    from app.vector_store.chunk_docstore import ChunkLogDocstore, PositionalIdMap
+    chunks = segment_store.open_chunk_log(index_path, manifest)
+    snapshot = manifest.get("snapshot")
+    if _snapshot_is_current(snapshot, index_type, len(chunks)):
+        index = read_index_snapshot(
+            os.path.join(index_path, snapshot["file"]),
+            segment_store.load_vectors(index_path, manifest, start=snapshot["count"]),
+        )
+    else:
+        index = build_faiss_index(segment_store.load_vectors(index_path, manifest), index_type)
+    return new_faiss_store(
+        get_embedder(),
+        index,
+        ChunkLogDocstore(chunks),
+        PositionalIdMap(len(chunks)),
+        segment_store.load_sparse_index(index_path, manifest, chunks),
+    )
+
+def _load_vector_store(index_path: str, collection_name: str = None):
+    from langchain_community.vectorstores import FAISS
+    index_type = get_index_type(collection_name)
+    manifest = segment_store.read_manifest(index_path)
+    if manifest is None:
+        # Indexes written before the segment store existed. This is the only path that
+        # unpickles; the first write migrates the collection.
+        store = FAISS.load_local(index_path, get_embedder(), allow_dangerous_deserialization=True)
+        store.sparse_index = SparseIndex().with_texts([
+            store.docstore.search(store.index_to_docstore_id[i]).page_content for i in range(store.index.ntotal)
+        ])
+        return store
+    try:
+        return _load_segment_store(index_path, manifest, index_type)
+    except FileNotFoundError:
+        # A compaction removed files between reading the manifest and opening them
+        return _load_segment_store(index_path, segment_store.read_manifest(index_path), index_type)
+
+def _migrate_legacy_index(index_path: str):
+    """
+    Rewrite a pickled FAISS index as the first segment of a segment store (one-time cost).
+    """
+    from langchain_community.vectorstores import FAISS
+    legacy = FAISS.load_local(index_path, get_embedder(), allow_dangerous_deserialization=True)
+    vectors = legacy.index.reconstruct_n(0, legacy.index.ntotal)
+    records = []
+    for i in range(legacy.index.ntotal):
+        doc_id = legacy.index_to_docstore_id[i]
+        doc = legacy.docstore.search(doc_id)
+        records.append({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata})
+    segment_store.append_segment(index_path, records, vectors)
+    # The manifest is committed, so the pickled files are no longer read
+    for name in ("index.faiss", "index.pkl"):
+        os.remove(os.path.join(index_path, name))
+    logger.info(f"Migrated legacy index at {index_path} to segment store")
+
 def get_vector_store(collection_name:str=None):
     try:
-        embedder = get_embedder()
         index_path = get_index_path(collection_name)
-        if os.path.exists(index_path):
-            return FAISS.load_local(index_path, embedder, allow_dangerous_deserialization=True)
-        return None
+        version = get_index_version(collection_name)
+        if version is None:
+            index_cache.invalidate(index_path)
+            return None
+        vector_store = index_cache.get(index_path, version)
+        if vector_store is None:
+            with span("index_load"):
+                vector_store = _load_vector_store(index_path, collection_name)
+            index_cache.put(index_path, vector_store, version)
+        return vector_store
     except Exception as e:
         logger.error(f"Error getting vector store: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 def create_vector_store(documents: List[Document], collection_name:str=None):
     try:
-        embedder = get_embedder()
-        vector_store = FAISS.from_documents(documents, embedder)
-        index_path = get_index_path(collection_name)
-        vector_store.save_local(index_path)
-        return vector_store
+        add_documents_to_vector_store(documents, collection_name)
+        return get_vector_store(collection_name)
     except Exception as e:
         logger.error(f"Error creating vector store: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 def add_documents_to_vector_store(documents: List[Document], collection_name:str=None):
     try:
-        vector_store = get_vector_store(collection_name)
-        if vector_store:
-            embedder = get_embedder()
-            new_store = FAISS.from_documents(documents, embedder)
-            vector_store.merge_from(new_store)
-            index_path = get_index_path(collection_name)
-            vector_store.save_local(index_path)
-        else:
-            create_vector_store(documents, collection_name)
+        texts = [doc.page_content for doc in documents]
+        vectors, hits = embed_documents_cached(texts)
+        if texts:
+            logger.info(f"Embedding cache hit ratio {hits / len(texts):.2f} ({hits}/{len(texts)})")
+        add_embedded_documents_to_vector_store(documents, vectors, collection_name)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding documents to vector store: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+def _update_cached_store(index_path, collection_name, previous_version, compacted, index_type, manifest, new_segments):
+    from app.vector_store.chunk_docstore import ChunkLogDocstore, PositionalIdMap
+    # Extend the cached store with the new segments instead of reloading the collection.
+    # The new store is a copy, so requests still searching the old one are never disturbed.
+    cached = index_cache.get(index_path, previous_version) if previous_version else None
+    total = segment_store.committed_count(manifest)
+    added = sum(segment["count"] for segment in new_segments)
+    if cached is not None and (
+        compacted or cached.index.ntotal != total - added or needs_rebuild(cached.index, index_type, total)
+    ):
+        # Let the next reader load the new snapshot (or rebuild and train) from disk
+        cached = None
+    if cached is None:
+        index_cache.invalidate(index_path)
+        return
+    index = copy_index(cached.index)
+    term_segments = list(cached.sparse_index.segments)
+    for segment in new_segments:
+        add_to_index(index, segment_store.load_segment_vectors(index_path, segment))
+        term_segments.append(segment_store.load_segment_terms(index_path, segment))
+    chunks = segment_store.open_chunk_log(index_path, manifest)
+    updated = new_faiss_store(
+        get_embedder(),
+        index,
+        ChunkLogDocstore(chunks),
+        PositionalIdMap(len(chunks)),
+        SparseIndex(term_segments),
+    )
+    index_cache.put(index_path, updated, get_index_version(collection_name))
+
+def _commit_segments(collection_name: Optional[str], write: Callable[[str], Dict[str, Any]]):
+    """
+    Commit new segments with `write(index_path)`, which returns the new manifest, then
+    compact if due and update the cached store.
+    """
+    index_path = get_index_path(collection_name)
+    index_type = get_index_type(collection_name)
+
+    with segment_store.collection_lock(index_path):
+        previous_version = get_index_version(collection_name)
+        if previous_version is not None and segment_store.read_manifest(index_path) is None:
+            _migrate_legacy_index(index_path)
+            previous_version = None
+        previous = segment_store.read_manifest(index_path)
+        previous_segments = len(previous["segments"]) if previous else 0
+
+        with span("index_save"):
+            # Only the new chunks are written to disk. Once the manifest is committed
+            # the chunks are stored, so nothing after this may fail the write: a retry
+            # would add them again.
+            manifest = write(index_path)
+            new_segments = manifest["segments"][previous_segments:]
+            compacted = _should_compact(manifest, index_type)
+            if compacted:
+                try:
+                    segment_store.compact_segments(
+                        index_path, lambda all_vectors, path: write_index_snapshot(all_vectors, path, index_type)
+                    )
+                except Exception as e:
+                    # The segments are still valid; compaction is retried on the next write
+                    logger.error(f"Error compacting {index_path}: {e}")
+
+        try:
+            _update_cached_store(
+                index_path, collection_name, previous_version, compacted, index_type, manifest, new_segments
+            )
+        except Exception as e:
+            logger.error(f"Error updating the cached index for {index_path}: {e}")
+            index_cache.invalidate(index_path)
+
+def _chunk_records(documents: List[Document]) -> List[Dict[str, Any]]:
+    return [
+        {"id": str(uuid.uuid4()), "page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in documents
+    ]
+
+def add_embedded_documents_to_vector_store(documents: List[Document], vectors, collection_name:str=None):
+    """
+    Add documents whose embeddings were already computed (e.g. by an ingestion worker process).
+    """
+    try:
+        records = _chunk_records(documents)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        _commit_segments(collection_name, lambda index_path: segment_store.append_segment(index_path, records, vectors))
+    except Exception as e:
+        logger.error(f"Error adding documents to vector store: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def start_pending_segments(collection_name:str=None) -> segment_store.PendingSegments:
+    """
+    Start an upload whose embedded chunks are written to disk batch by batch, and added
+    to the collection all at once by commit_pending_segments.
+    """
+    return segment_store.PendingSegments(get_index_path(collection_name))
+
+def stage_embedded_documents(pending: segment_store.PendingSegments, documents: List[Document], vectors):
+    pending.append(_chunk_records(documents), np.asarray(vectors, dtype=np.float32))
+
+def commit_pending_segments(pending: segment_store.PendingSegments, collection_name:str=None):
+    try:
+        if pending.count:
+            _commit_segments(collection_name, lambda index_path: pending.commit())
+    except Exception as e:
+        logger.error(f"Error committing documents to vector store: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import threading
+import logging
+from app.config.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+def estimate_vector_store_bytes(vector_store) -> int:
+    """
+    Rough in-memory size of a loaded FAISS vector store (vectors, BM25 postings and
+    chunk texts).
+    """
+    from app.vector_store.index_factory import estimate_index_bytes
+    size = estimate_index_bytes(vector_store.index)
+    sparse_index = getattr(vector_store, "sparse_index", None)
+    if sparse_index is not None:
+        size += sparse_index.nbytes
+    docs = getattr(vector_store.docstore, "_dict", {})
+    for doc in docs.values():
+        size += len(doc.page_content)
+    return size
+
+class IndexCache:
+    """LRU cache of loaded vector stores, bounded by their estimated size in bytes"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        # Unset reads INDEX_CACHE_MAX_BYTES when used, so the shared cache can be created
+        # at import without loading the settings
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, Hashable, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._removal_listeners: List[Callable[[str], None]] = []
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else get_settings().INDEX_CACHE_MAX_BYTES
+
+    def add_removal_listener(self, listener: Callable[[str], None]):
+        """
+        Call `listener(key)` whenever a store leaves the cache (evicted, invalidated or
+        replaced), so anything built on top of it can let it go too.
+        """
+        self._removal_listeners.append(listener)
+
+    def holds(self, key: str, vector_store) -> bool:
+        """Whether this exact store is the cached one for the key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] is vector_store
+
+    def get(self, key: str, version: Hashable) -> Optional[Any]:
+        """Return the cached store if it was loaded from the given on-disk version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            stale = entry is not None and entry[1] != version
+            if stale:
+                # The index was rewritten since we loaded it
+                self._remove(key)
+            if entry is None or stale:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if stale:
+            self._notify([key])
+        return None if entry is None or stale else entry[0]
+
+    def put(self, key: str, vector_store, version: Hashable):
+        """Insert or replace the store for a key, evicting least recently used entries"""
+        size = estimate_vector_store_bytes(vector_store)
+        removed = []
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                removed.append(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (vector_store, version, size)
+                self._total_bytes += size
+            else:
+                logger.info(f"Not caching index {key}: {size} bytes exceeds cache size")
+            while self._total_bytes > self.max_bytes:
+                evicted_key, _ = next(iter(self._entries.items()))
+                self._remove(evicted_key)
+                removed.append(evicted_key)
+                self.evictions += 1
+                logger.debug(f"Evicted index {evicted_key} from cache")
+        self._notify(removed)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            removed = key in self._entries
+            if removed:
+                self._remove(key)
+        if removed:
+            self._notify([key])
+
+    def clear(self):
+        with self._lock:
+            removed = list(self._entries)
+            self._entries.clear()
+            self._total_bytes = 0
+        self._notify(removed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _notify(self, keys: List[str]):
+        # Outside the cache lock, so listeners may take their own locks
+        for key in keys:
+            for listener in self._removal_listeners:
+                listener(key)
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
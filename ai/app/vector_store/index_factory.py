@@ -0,0 +1,207 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import logging
+import math
+import warnings
+import numpy as np
+from app.config.config import get_settings
+
+# faiss and langchain's FAISS store are imported where used: loading them takes a
+# noticeable part of worker start, and `import app.main` goes through this module
+if TYPE_CHECKING:
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+def get_index_type(collection_name: Optional[str] = None) -> str:
+    """
+    Index type configured for a collection, falling back to the default type.
+    """
+    settings = get_settings()
+    index_type = settings.FAISS_INDEX_TYPE_OVERRIDES.get(collection_name or "default", settings.FAISS_INDEX_TYPE)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+    return index_type
+
+def uses_cosine() -> bool:
+    return get_settings().FAISS_METRIC == "cosine"
+
+def build_faiss_index(vectors: np.ndarray, index_type: str) -> "faiss.Index":
+    """
+    Build a FAISS index of the given type over raw embeddings. With the cosine metric
+    the vectors are L2-normalized and searched by inner product.
+    """
+    import faiss
+    settings = get_settings()
+    vectors = np.array(vectors, dtype=np.float32, copy=True)
+    count, dim = vectors.shape
+    if uses_cosine():
+        faiss.normalize_L2(vectors)
+        metric = faiss.METRIC_INNER_PRODUCT
+    else:
+        metric = faiss.METRIC_L2
+
+    if index_type == "ivfpq" and count < settings.FAISS_IVF_TRAIN_THRESHOLD:
+        # Too few vectors to train useful centroids; flat search is fast at this size
+        index_type = "flat"
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, settings.FAISS_HNSW_M, metric)
+        index.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = settings.FAISS_HNSW_EF_SEARCH
+    elif index_type == "ivfpq":
+        # Rule of thumb: about 4 * sqrt(n) lists, with the ~39 training points per
+        # centroid k-means wants
+        nlist = max(1, min(settings.FAISS_IVF_NLIST, int(4 * math.sqrt(count)), count // 39))
+        quantizer = faiss.IndexFlat(dim, metric)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, settings.FAISS_PQ_M, settings.FAISS_PQ_NBITS, metric)
+        logger.info(f"Training IVF-PQ index with {nlist} lists on {count} vectors")
+        index.train(vectors)
+        index.nprobe = min(settings.FAISS_IVF_NPROBE, nlist)
+    else:
+        index = faiss.IndexFlat(dim, metric)
+
+    if count:
+        index.add(vectors)
+    return index
+
+def add_to_index(index, vectors: np.ndarray):
+    """Add raw embeddings to an index built by build_faiss_index"""
+    import faiss
+    vectors = np.array(vectors, dtype=np.float32, copy=True)
+    if uses_cosine():
+        faiss.normalize_L2(vectors)
+    index.add(vectors)
+
+class LayeredIndex:
+    """
+    A read-only base index (typically memory-mapped from a snapshot) plus an in-memory
+    delta holding vectors added since. FAISS aborts the process when adding to a mapped
+    index, so every add goes to the delta and searches merge both.
+    """
+
+    def __init__(self, base: "faiss.Index", delta: "faiss.Index", mapped: bool = False):
+        self.base = base
+        self.delta = delta
+        self.mapped = mapped
+        self.d = base.d
+        self.metric_type = base.metric_type
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal + self.delta.ntotal
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        import faiss
+        distances, labels = self.base.search(x, k)
+        if self.delta.ntotal == 0:
+            return distances, labels
+        delta_distances, delta_labels = self.delta.search(x, k)
+        delta_labels = np.where(delta_labels >= 0, delta_labels + self.base.ntotal, -1)
+        distances = np.hstack([distances, delta_distances])
+        labels = np.hstack([labels, delta_labels])
+        keys = -distances if self.metric_type == faiss.METRIC_INNER_PRODUCT else distances
+        # Missing results rank last
+        keys = np.where(labels < 0, np.inf, keys)
+        order = np.argsort(keys, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(labels, order, axis=1)
+
+    def add(self, x: np.ndarray):
+        self.delta.add(x)
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        if key < self.base.ntotal:
+            return self.base.reconstruct(key)
+        return self.delta.reconstruct(key - self.base.ntotal)
+
+    def copy(self) -> "LayeredIndex":
+        """Copy that shares the read-only base"""
+        import faiss
+        return LayeredIndex(self.base, faiss.clone_index(self.delta), self.mapped)
+
+def copy_index(index):
+    import faiss
+    if isinstance(index, LayeredIndex):
+        return index.copy()
+    return faiss.clone_index(index)
+
+def write_index_snapshot(vectors: np.ndarray, path: str, index_type: str) -> Dict[str, Any]:
+    """
+    Build an index over the vectors and write it to `path`, returning what it was built with.
+    """
+    import faiss
+    faiss.write_index(build_faiss_index(vectors, index_type), path)
+    return {"index_type": index_type, "metric": get_settings().FAISS_METRIC}
+
+def read_index_snapshot(path: str, delta_vectors: np.ndarray) -> LayeredIndex:
+    """
+    Open a snapshot read-only, memory-mapped when enabled and supported by this FAISS
+    build, and layer the vectors added after it on top.
+    """
+    import faiss
+    settings = get_settings()
+    mmap_flags = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    mapped = settings.INDEX_MMAP_ENABLED and mmap_flags is not None
+    if mapped:
+        base = faiss.read_index(path, mmap_flags | faiss.IO_FLAG_READ_ONLY)
+    else:
+        base = faiss.read_index(path)
+    # Search parameters are runtime settings, not part of the index
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = settings.FAISS_HNSW_EF_SEARCH
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(settings.FAISS_IVF_NPROBE, base.nlist)
+    return LayeredIndex(base, build_faiss_index(delta_vectors, "flat"), mapped)
+
+def needs_rebuild(index, index_type: str, new_total: int) -> bool:
+    """
+    Whether a collection outgrew its index, i.e. it is still flat but should now be trained as IVF-PQ.
+    """
+    import faiss
+    base = index.base if isinstance(index, LayeredIndex) else index
+    return (
+        index_type == "ivfpq"
+        and not isinstance(base, faiss.IndexIVF)
+        and new_total >= get_settings().FAISS_IVF_TRAIN_THRESHOLD
+    )
+
+def estimate_index_bytes(index) -> int:
+    import faiss
+    if isinstance(index, LayeredIndex):
+        # Mapped pages live in the shared page cache, not in this process
+        base_bytes = 0 if index.mapped else estimate_index_bytes(index.base)
+        return base_bytes + estimate_index_bytes(index.delta)
+    if isinstance(index, faiss.IndexIVFPQ):
+        # PQ codes plus the stored ids
+        return index.ntotal * (index.code_size + 8)
+    if isinstance(index, faiss.IndexHNSW):
+        # Vectors plus roughly 2*M neighbour links per vector
+        return index.ntotal * (index.d * 4 + index.hnsw.nb_neighbors(0) * 4)
+    return index.ntotal * index.d * 4
+
+def new_faiss_store(embedding_function, index, docstore, index_to_docstore_id, sparse_index=None) -> "FAISS":
+    """
+    Wrap an index in a langchain FAISS store with the configured metric. The
+    collection's BM25 index, if any, travels with it as `sparse_index`.
+    """
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+    if not uses_cosine():
+        store = FAISS(embedding_function, index, docstore, index_to_docstore_id)
+    else:
+        with warnings.catch_warnings():
+            # langchain warns that normalize_L2 is meant for L2 distance, but normalizing
+            # queries and added vectors is exactly what cosine-by-inner-product needs
+            warnings.filterwarnings("ignore", message="Normalizing L2 is not applicable")
+            store = FAISS(
+                embedding_function,
+                index,
+                docstore,
+                index_to_docstore_id,
+                normalize_L2=True,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+    store.sparse_index = sparse_index
+    return store
@@ -0,0 +1,224 @@
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStoreRetriever
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import time
+import numpy as np
+from app.config.config import get_settings
+from app.ingestion.embedder import embed_query_cached
+from app.utils.concurrency import run_in_cpu_pool, submit_to_cpu_pool
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("hybrid", "dense")
+
+class PooledVectorStoreRetriever(VectorStoreRetriever):
+    """Vector store retriever whose async path embeds and searches in the bounded CPU pool"""
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> List[Document]:
+        if self.search_type != "similarity":
+            return super()._get_relevant_documents(query, run_manager=run_manager, **kwargs)
+        # Same as the base class, split so embedding and search are timed separately
+        embedding = embed_query_cached(query)
+        with span("faiss_search"):
+            return self.vectorstore.similarity_search_by_vector(embedding, **{**self.search_kwargs, **kwargs})
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return await run_in_cpu_pool(
+            self._get_relevant_documents, query, run_manager=run_manager.get_sync(), **kwargs
+        )
+
+def as_pooled_retriever(vector_store, **kwargs) -> PooledVectorStoreRetriever:
+    tags = kwargs.pop("tags", None) or [*vector_store._get_retriever_tags()]
+    return PooledVectorStoreRetriever(vectorstore=vector_store, tags=tags, **kwargs)
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense (FAISS) and sparse (BM25) search over a collection, fused with weighted
+    reciprocal rank fusion. The async path runs both searches in the CPU pool at once.
+    """
+
+    vector_store: Any
+    k: int = 4
+    fetch_k: int = 20
+    dense_weight: float = 1.0
+    sparse_weight: float = 1.0
+    rrf_k: int = 60
+
+    def dense_search(self, query: str, embedding: Optional[List[float]] = None) -> List[int]:
+        if self.dense_weight == 0:
+            return []
+        store = self.vector_store
+        if embedding is None:
+            embedding = embed_query_cached(query)
+        vector = np.asarray([embedding], dtype=np.float32)
+        if store._normalize_L2:
+            import faiss
+            faiss.normalize_L2(vector)
+        with span("faiss_search"):
+            _, labels = store.index.search(vector, self.fetch_k)
+        return [int(position) for position in labels[0] if position >= 0]
+
+    def sparse_search(self, query: str) -> List[int]:
+        if self.sparse_weight == 0 or self.vector_store.sparse_index is None:
+            return []
+        with span("bm25_search"):
+            results = self.vector_store.sparse_index.search(query, self.fetch_k)
+        return [position for position, _ in results]
+
+    def fuse(self, dense: List[int], sparse: List[int]) -> List[Tuple[Document, float]]:
+        """Top-k documents with their fused scores"""
+        scores = defaultdict(float)
+        for weight, ranking in ((self.dense_weight, dense), (self.sparse_weight, sparse)):
+            for rank, position in enumerate(ranking, start=1):
+                scores[position] += weight / (self.rrf_k + rank)
+        top = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        store = self.vector_store
+        return [(store.docstore.search(store.index_to_docstore_id[position]), scores[position]) for position in top]
+
+    def search_with_scores(self, query: str, embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        return self.fuse(self.dense_search(query, embedding), self.sparse_search(query))
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query)]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense, sparse = await asyncio.gather(
+            run_in_cpu_pool(self.dense_search, query),
+            run_in_cpu_pool(self.sparse_search, query),
+        )
+        return [doc for doc, _ in self.fuse(dense, sparse)]
+
+def create_retriever(vector_store) -> BaseRetriever:
+    """
+    Retriever for a collection as configured by the RETRIEVAL_* settings.
+    """
+    settings = get_settings()
+    if settings.RETRIEVAL_MODE not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown RETRIEVAL_MODE: {settings.RETRIEVAL_MODE}")
+    if settings.RETRIEVAL_MODE == "dense" or getattr(vector_store, "sparse_index", None) is None:
+        return as_pooled_retriever(vector_store, search_kwargs={"k": settings.RETRIEVAL_K})
+    return HybridRetriever(
+        vector_store=vector_store,
+        k=settings.RETRIEVAL_K,
+        fetch_k=max(settings.RETRIEVAL_FETCH_K, settings.RETRIEVAL_K),
+        dense_weight=settings.RETRIEVAL_DENSE_WEIGHT,
+        sparse_weight=settings.RETRIEVAL_SPARSE_WEIGHT,
+        rrf_k=settings.RETRIEVAL_RRF_K,
+        tags=[*vector_store._get_retriever_tags(), "hybrid"],
+    )
+
+def _scored_search(retriever: BaseRetriever, query: str, embedding: List[float]) -> List[Tuple[Document, float]]:
+    """Search one collection; higher scores are better"""
+    import faiss
+    if isinstance(retriever, HybridRetriever):
+        return retriever.search_with_scores(query, embedding)
+    store = retriever.vectorstore
+    with span("faiss_search"):
+        results = store.similarity_search_with_score_by_vector(embedding, k=retriever.search_kwargs.get("k", 4))
+    if store.index.metric_type == faiss.METRIC_L2:
+        return [(doc, -float(distance)) for doc, distance in results]
+    return [(doc, float(score)) for doc, score in results]
+
+class MultiCollectionRetriever(BaseRetriever):
+    """
+    Searches several collections at once on the CPU pool and merges the results by
+    score. The query is embedded once for all of them. Collections that haven't
+    answered within the latency budget are left out, unless none has answered yet.
+    Scores are comparable across collections because every collection uses the same
+    embedder, metric and retrieval mode.
+    """
+
+    shards: List[Tuple[str, BaseRetriever]]
+    k: int = 4
+    # Seconds; None waits for every collection
+    latency_budget: Optional[float] = None
+
+    def _embed(self, query: str) -> np.ndarray:
+        # Every collection is embedded with the shared model
+        return embed_query_cached(query)
+
+    def _remaining_budget(self, started: float) -> Optional[float]:
+        if self.latency_budget is None:
+            return None
+        return max(0.0, self.latency_budget - (time.perf_counter() - started))
+
+    def _merge(self, results: Sequence[Tuple[str, Any]], dropped: Sequence[str]) -> List[Document]:
+        if dropped:
+            logger.warning(f"Dropped slow collections from the search: {', '.join(dropped)}")
+        scored = []
+        for name, outcome in results:
+            if isinstance(outcome, BaseException):
+                logger.error(f"Error searching collection {name}: {outcome}")
+                continue
+            for doc, score in outcome:
+                # Copy, so documents held by an in-memory docstore aren't modified
+                doc = Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "collection": name})
+                scored.append((doc, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [doc for doc, _ in scored[:self.k]]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        started = time.perf_counter()
+        embedding = self._embed(query)
+        futures = {
+            submit_to_cpu_pool(_scored_search, retriever, query, embedding): name
+            for name, retriever in self.shards
+        }
+        done, pending = wait(futures, timeout=self._remaining_budget(started))
+        if not done:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in pending:
+            future.cancel()
+        results = [(futures[future], future.exception() or future.result()) for future in done]
+        return self._merge(results, [futures[future] for future in pending])
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        started = time.perf_counter()
+        embedding = await run_in_cpu_pool(self._embed, query)
+        tasks = {
+            asyncio.ensure_future(run_in_cpu_pool(_scored_search, retriever, query, embedding)): name
+            for name, retriever in self.shards
+        }
+        done, pending = await asyncio.wait(tasks, timeout=self._remaining_budget(started))
+        if not done:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            # Searches that haven't started yet are removed from the pool's queue
+            task.cancel()
+        results = [(tasks[task], task.exception() or task.result()) for task in done]
+        return self._merge(results, [tasks[task] for task in pending])
+
+def create_multi_collection_retriever(vector_stores: Sequence[Tuple[str, Any]]) -> MultiCollectionRetriever:
+    """
+    Retriever over several loaded collections, given as (name, vector store) pairs.
+    """
+    settings = get_settings()
+    budget = settings.FANOUT_LATENCY_BUDGET_MS
+    return MultiCollectionRetriever(
+        shards=[(name, create_retriever(vector_store)) for name, vector_store in vector_stores],
+        k=settings.RETRIEVAL_K,
+        latency_budget=budget / 1000 if budget else None,
+    )
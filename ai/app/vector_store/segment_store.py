@@ -0,0 +1,451 @@
+"""
+Append-friendly on-disk format for a collection's vectors and chunks.
+
+    <index_path>/
+        manifest.json        committed state, replaced atomically on every write
+        seg-000001.npy       float32 vectors added by one write
+        terms-000001.npz     BM25 postings of the same chunks (see sparse_index)
+        chunks.jsonl         append-only chunk log, one JSON record per vector
+        chunks.offsets       int64 byte offset of every record in the chunk log
+        snapshot-000003.faiss  prebuilt index over the first vectors, written by compaction
+        pending-<token>/     segments of an upload still being embedded (see PendingSegments)
+
+Each upload writes one new segment and appends its chunks to the log, so write cost
+scales with the new chunks only. The manifest is the commit point: it lists the
+segments and the committed length of the log. A crash before it is replaced leaves the
+previous state intact, and any orphaned segment or torn log tail is ignored on load
+and overwritten by the next write. Segments are merged once there are too many.
+
+Nothing is pickled: readers memory-map the snapshot, the offsets and the chunk log, so
+worker processes serving the same collection share those pages through the OS page cache.
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+from app.vector_store.sparse_index import SparseIndex, TermSegment
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+LOG_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.offsets"
+LOCK_FILE = ".lock"
+PENDING_PREFIX = "pending-"
+FORMAT_VERSION = 1
+# Pending uploads untouched for this long were left by a crashed worker (seconds)
+PENDING_MAX_AGE = 24 * 3600
+
+def manifest_path(index_path: str) -> str:
+    return os.path.join(index_path, MANIFEST_FILE)
+
+def read_manifest(index_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(manifest_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _fsync_dir(path: str):
+    # Make renames durable; not supported on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_file_atomic(path: str, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _write_manifest(index_path: str, manifest: Dict[str, Any]):
+    _write_file_atomic(
+        manifest_path(index_path),
+        lambda f: f.write(json.dumps(manifest).encode("utf-8")),
+    )
+    _fsync_dir(index_path)
+
+def _segment_name(number: int) -> str:
+    return f"seg-{number:06d}.npy"
+
+def _write_segment(index_path: str, number: int, vectors: np.ndarray) -> str:
+    name = _segment_name(number)
+    _write_file_atomic(os.path.join(index_path, name), lambda f: np.save(f, vectors))
+    return name
+
+def _terms_name(number: int) -> str:
+    return f"terms-{number:06d}.npz"
+
+def _write_terms(index_path: str, number: int, terms: TermSegment) -> str:
+    name = _terms_name(number)
+    _write_file_atomic(os.path.join(index_path, name), terms.save)
+    return name
+
+def _load_terms(index_path: str, segment: Dict[str, Any], start: int, chunks: "ChunkLog") -> TermSegment:
+    if "terms" in segment:
+        return load_segment_terms(index_path, segment)
+    # Written before the sparse index existed
+    return TermSegment.from_texts(
+        chunks.record(position)["page_content"] for position in range(start, start + segment["count"])
+    )
+
+def load_sparse_index(index_path: str, manifest: Dict[str, Any], chunks: "ChunkLog") -> SparseIndex:
+    segments = []
+    position = 0
+    for segment in manifest["segments"]:
+        segments.append(_load_terms(index_path, segment, position, chunks))
+        position += segment["count"]
+    return SparseIndex(segments)
+
+def load_segment_terms(index_path: str, segment: Dict[str, Any]) -> TermSegment:
+    return TermSegment.load(os.path.join(index_path, segment["terms"]))
+
+def committed_count(manifest: Dict[str, Any]) -> int:
+    return sum(segment["count"] for segment in manifest["segments"])
+
+def load_vectors(index_path: str, manifest: Dict[str, Any], start: int = 0) -> np.ndarray:
+    """
+    Load the committed vectors from position `start` on. Snapshots always cover whole
+    segments, so `start` is a segment boundary.
+    """
+    vectors = []
+    position = 0
+    for segment in manifest["segments"]:
+        if position >= start:
+            vectors.append(np.load(os.path.join(index_path, segment["file"]), mmap_mode="r"))
+        position += segment["count"]
+    if not vectors:
+        return np.zeros((0, manifest["dim"]), dtype=np.float32)
+    return np.vstack(vectors)
+
+def load_segment_vectors(index_path: str, segment: Dict[str, Any]) -> np.ndarray:
+    """The vectors of one segment, memory-mapped"""
+    return np.load(os.path.join(index_path, segment["file"]), mmap_mode="r")
+
+def _scan_offsets(data) -> np.ndarray:
+    offsets = []
+    position = 0
+    while position < len(data):
+        offsets.append(position)
+        end = data.find(b"\n", position)
+        position = len(data) if end == -1 else end + 1
+    return np.asarray(offsets, dtype=np.int64)
+
+class ChunkLog:
+    """Read-only, memory-mapped view of the committed chunk records"""
+
+    def __init__(self, index_path: str, manifest: Dict[str, Any]):
+        self._count = committed_count(manifest)
+        self._size = manifest["log_size"]
+        self._data = b""
+        self._offsets = np.zeros(0, dtype=np.int64)
+        if self._size == 0:
+            return
+        with open(os.path.join(index_path, LOG_FILE), "rb") as f:
+            # Anything past the committed size is a torn or uncommitted write
+            self._data = mmap.mmap(f.fileno(), self._size, access=mmap.ACCESS_READ)
+
+        offsets_path = os.path.join(index_path, OFFSETS_FILE)
+        if os.path.exists(offsets_path) and os.path.getsize(offsets_path) >= self._count * 8:
+            self._offsets = np.memmap(offsets_path, dtype=np.int64, mode="r", shape=(self._count,))
+        else:
+            # Written before offsets were stored; the next write adds the file
+            self._offsets = _scan_offsets(self._data)
+        if len(self._offsets) != self._count:
+            raise ValueError(
+                f"Corrupt segment store at {index_path}: "
+                f"{len(self._offsets)} chunks but {self._count} vectors"
+            )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, position: int) -> Dict[str, Any]:
+        start = int(self._offsets[position])
+        end = int(self._offsets[position + 1]) if position + 1 < self._count else self._size
+        return json.loads(self._data[start:end])
+
+def open_chunk_log(index_path: str, manifest: Dict[str, Any]) -> ChunkLog:
+    return ChunkLog(index_path, manifest)
+
+_process_locks: Dict[str, threading.Lock] = {}
+_process_locks_guard = threading.Lock()
+
+@contextmanager
+def collection_lock(index_path: str):
+    """
+    Serialize writers of a collection across threads and worker processes.
+    """
+    with _process_locks_guard:
+        lock = _process_locks.setdefault(index_path, threading.Lock())
+    os.makedirs(index_path, exist_ok=True)
+    with lock, open(os.path.join(index_path, LOCK_FILE), "a+b") as f:
+        try:
+            import fcntl
+        except ImportError:
+            # Not available on Windows; run a single writer process there
+            fcntl = None
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _write_offsets(index_path: str, manifest: Dict[str, Any], log_path: str, new_offsets: Iterable[np.ndarray]):
+    offsets_path = os.path.join(index_path, OFFSETS_FILE)
+    committed = committed_count(manifest)
+    if not os.path.exists(offsets_path) or os.path.getsize(offsets_path) < committed * 8:
+        # Backfill stores written before offsets were stored
+        with open(log_path, "rb") as f:
+            existing = _scan_offsets(f.read(manifest["log_size"]))
+        _write_file_atomic(offsets_path, lambda f: f.write(existing.tobytes()))
+    with open(offsets_path, "r+b") as f:
+        f.truncate(committed * 8)
+        f.seek(0, os.SEEK_END)
+        for offsets in new_offsets:
+            f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+def _new_manifest(dim: int) -> Dict[str, Any]:
+    return {
+        "format": FORMAT_VERSION,
+        "dim": dim,
+        "segments": [],
+        "log_size": 0,
+        "next_segment": 1,
+    }
+
+def _check_dim(manifest: Dict[str, Any], dim: int):
+    if dim != manifest["dim"]:
+        raise ValueError(f"Vector dimension {dim} does not match index dimension {manifest['dim']}")
+
+def append_segment(
+    index_path: str,
+    records: List[Dict[str, Any]],
+    vectors: np.ndarray,
+) -> Dict[str, Any]:
+    """
+    Durably append chunk records and their vectors as a new segment and return the new
+    manifest. Callers must hold the collection lock.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    os.makedirs(index_path, exist_ok=True)
+    manifest = read_manifest(index_path) or _new_manifest(int(vectors.shape[1]))
+    _check_dim(manifest, int(vectors.shape[1]))
+
+    segment_file = _write_segment(index_path, manifest["next_segment"], vectors)
+    terms_file = _write_terms(
+        index_path, manifest["next_segment"], TermSegment.from_texts(record["page_content"] for record in records)
+    )
+
+    log_path = os.path.join(index_path, LOG_FILE)
+    new_offsets = []
+    with open(log_path, "ab") as f:
+        # Drop any tail left by a write that crashed before committing
+        f.truncate(manifest["log_size"])
+        f.seek(manifest["log_size"])
+        for record in records:
+            new_offsets.append(f.tell())
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+        log_size = f.tell()
+    _write_offsets(index_path, manifest, log_path, [new_offsets])
+
+    manifest = {
+        **manifest,
+        "segments": manifest["segments"] + [{"file": segment_file, "terms": terms_file, "count": len(records)}],
+        "log_size": log_size,
+        "next_segment": manifest["next_segment"] + 1,
+    }
+    _write_manifest(index_path, manifest)
+    return manifest
+
+class PendingSegments:
+    """
+    Segments of one upload, written batch by batch while it is being embedded and not
+    yet part of the collection. Every batch becomes a segment in a private directory,
+    so memory use is bounded by a batch whatever the size of the upload. commit()
+    publishes all of them with one manifest write; discard() removes them.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.token = uuid.uuid4().hex[:12]
+        self.directory = os.path.join(index_path, f"{PENDING_PREFIX}{self.token}")
+        os.makedirs(self.directory)
+        self.segments: List[Dict[str, Any]] = []
+        self.dim: Optional[int] = None
+        self.count = 0
+        # Chunk records and their offsets, relative to the start of this upload
+        self._log = open(os.path.join(self.directory, LOG_FILE), "wb")
+        self._offsets = open(os.path.join(self.directory, OFFSETS_FILE), "wb")
+
+    def append(self, records: List[Dict[str, Any]], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match upload dimension {self.dim}")
+
+        number = len(self.segments) + 1
+        segment = {
+            "file": f"seg-{self.token}-{number:06d}.npy",
+            "terms": f"terms-{self.token}-{number:06d}.npz",
+            "count": len(records),
+        }
+        _write_file_atomic(os.path.join(self.directory, segment["file"]), lambda f: np.save(f, vectors))
+        _write_file_atomic(
+            os.path.join(self.directory, segment["terms"]),
+            TermSegment.from_texts(record["page_content"] for record in records).save,
+        )
+        offsets = []
+        for record in records:
+            offsets.append(self._log.tell())
+            self._log.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._offsets.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        self.segments.append(segment)
+        self.count += len(records)
+
+    def commit(self) -> Dict[str, Any]:
+        """
+        Move the segments into the collection and commit them with one manifest write,
+        returning the new manifest. Callers must hold the collection lock.
+        """
+        for f in (self._log, self._offsets):
+            f.flush()
+            os.fsync(f.fileno())
+        manifest = read_manifest(self.index_path) or _new_manifest(self.dim)
+        _check_dim(manifest, self.dim)
+
+        # Until the manifest lists them, moved segments are orphans that loading ignores
+        for segment in self.segments:
+            for name in (segment["file"], segment["terms"]):
+                os.replace(os.path.join(self.directory, name), os.path.join(self.index_path, name))
+
+        log_path = os.path.join(self.index_path, LOG_FILE)
+        with open(log_path, "ab") as f, open(self._log.name, "rb") as pending_log:
+            # Drop any tail left by a write that crashed before committing
+            f.truncate(manifest["log_size"])
+            f.seek(manifest["log_size"])
+            shutil.copyfileobj(pending_log, f)
+            f.flush()
+            os.fsync(f.fileno())
+            log_size = f.tell()
+        if self.count:
+            offsets = np.memmap(self._offsets.name, dtype=np.int64, mode="r", shape=(self.count,))
+            _write_offsets(self.index_path, manifest, log_path, (
+                offsets[start:start + 65536] + manifest["log_size"] for start in range(0, self.count, 65536)
+            ))
+
+        manifest = {
+            **manifest,
+            "segments": manifest["segments"] + self.segments,
+            "log_size": log_size,
+        }
+        _write_manifest(self.index_path, manifest)
+        self.discard()
+        return manifest
+
+    def discard(self):
+        """Remove whatever is left of the upload"""
+        for f in (self._log, self._offsets):
+            f.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def remove_stale_pending(index_path: str, max_age: float = PENDING_MAX_AGE):
+    """Remove pending uploads abandoned by a worker that crashed"""
+    cutoff = time.time() - max_age
+    for name in os.listdir(index_path):
+        path = os.path.join(index_path, name)
+        if name.startswith(PENDING_PREFIX) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed abandoned upload {path}")
+
+def needs_compaction(manifest: Dict[str, Any], max_segments: int, snapshot_delta: Optional[int]) -> bool:
+    """
+    Whether there are too many segments, or (with `snapshot_delta` set) at least that
+    many vectors not yet covered by the snapshot.
+    """
+    if len(manifest["segments"]) > max_segments:
+        return True
+    if snapshot_delta is None:
+        return False
+    snapshot = manifest.get("snapshot")
+    covered = snapshot["count"] if snapshot else 0
+    return committed_count(manifest) - covered >= snapshot_delta
+
+def _snapshot_name(number: int) -> str:
+    return f"snapshot-{number:06d}.faiss"
+
+def compact_segments(
+    index_path: str,
+    write_snapshot: Optional[Callable[[np.ndarray, str], Dict[str, Any]]] = None,
+):
+    """
+    Merge all committed segments into one and, given `write_snapshot(vectors, path)`,
+    write a prebuilt index over them. Old files are removed only after the manifest
+    pointing at the new ones has been committed.
+    """
+    manifest = read_manifest(index_path)
+    if manifest is None or (len(manifest["segments"]) <= 1 and write_snapshot is None):
+        return
+
+    vectors = load_vectors(index_path, manifest)
+    number = manifest["next_segment"]
+    if len(manifest["segments"]) == 1 and "terms" in manifest["segments"][0]:
+        merged = manifest["segments"][0]
+        old_files = []
+    else:
+        terms = load_sparse_index(index_path, manifest, open_chunk_log(index_path, manifest))
+        merged = {
+            "file": _write_segment(index_path, number, vectors),
+            "terms": _write_terms(index_path, number, TermSegment.merge(terms.segments)),
+            "count": int(vectors.shape[0]),
+        }
+        old_files = [name for segment in manifest["segments"] for name in (segment["file"], segment.get("terms")) if name]
+
+    # A snapshot must end on a segment boundary, so the old one can't outlive the merge
+    snapshot = manifest.get("snapshot")
+    if snapshot:
+        old_files.append(snapshot["file"])
+        snapshot = None
+    if write_snapshot is not None:
+        snapshot_path = os.path.join(index_path, _snapshot_name(number))
+        description = write_snapshot(vectors, snapshot_path + ".tmp")
+        with open(snapshot_path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+        snapshot = {**description, "file": _snapshot_name(number), "count": int(vectors.shape[0])}
+
+    _write_manifest(index_path, {
+        **manifest,
+        "segments": [merged],
+        "next_segment": number + 1,
+        "snapshot": snapshot,
+    })
+
+    # Readers that still have the old files open or mapped keep working (POSIX)
+    for name in old_files:
+        try:
+            os.remove(os.path.join(index_path, name))
+        except OSError as e:
+            logger.warning(f"Could not remove compacted file {name}: {e}")
+    logger.info(f"Compacted {len(manifest['segments'])} segments in {index_path}")
+    remove_stale_pending(index_path)
@@ -0,0 +1,171 @@
+"""
+BM25 inverted index over a collection's chunks, stored next to its vector segments.
+
+Each vector segment gets a term segment with the postings of the same chunks, so the
+sparse index grows with every upload without re-tokenizing the collection. Term
+segments are saved as plain .npz arrays (no pickle) and merged on compaction.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+import math
+import re
+import numpy as np
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words, plus identifiers joined by - . / : such as part numbers, versions and paths
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+_TOKEN_SEPARATORS = re.compile(r"[-./:]")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it of on or that the this "
+    "to was were what when where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms of a text. Compound identifiers are kept whole and also split
+    into their parts, so "XJ-2045" matches both "xj-2045" and "2045".
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if _TOKEN_SEPARATORS.search(token):
+            tokens.extend(part for part in _TOKEN_SEPARATORS.split(token) if part)
+    return tokens
+
+class TermSegment:
+    """Postings of a contiguous run of chunks, in CSR layout (one row per term)"""
+
+    def __init__(self, terms: np.ndarray, indptr: np.ndarray, docs: np.ndarray, freqs: np.ndarray, lengths: np.ndarray):
+        self.terms = terms
+        self.indptr = indptr
+        self.docs = docs
+        self.freqs = freqs
+        self.lengths = lengths
+        self._rows = {term: row for row, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "TermSegment":
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, freq in counts.items():
+                postings[term].append((doc, freq))
+        return cls._from_postings(postings, np.asarray(lengths, dtype=np.int32))
+
+    @classmethod
+    def merge(cls, segments: Sequence["TermSegment"]) -> "TermSegment":
+        """Concatenate segments covering consecutive runs of chunks"""
+        postings: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = defaultdict(list)
+        base = 0
+        for segment in segments:
+            for term, row in segment._rows.items():
+                start, end = segment.indptr[row], segment.indptr[row + 1]
+                postings[term].append((segment.docs[start:end] + base, segment.freqs[start:end]))
+            base += len(segment)
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([sum(len(docs) for docs, _ in postings[term]) for term in terms])
+        docs = [docs for term in terms for docs, _ in postings[term]]
+        freqs = [freqs for term in terms for _, freqs in postings[term]]
+        return cls(
+            np.asarray(terms, dtype=str),
+            indptr,
+            np.concatenate(docs).astype(np.int32) if docs else np.zeros(0, dtype=np.int32),
+            np.concatenate(freqs).astype(np.int32) if freqs else np.zeros(0, dtype=np.int32),
+            np.concatenate([segment.lengths for segment in segments]) if segments else np.zeros(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def _from_postings(cls, postings: Dict[str, List[Tuple[int, int]]], lengths: np.ndarray) -> "TermSegment":
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(postings[term]) for term in terms])
+        pairs = [pair for term in terms for pair in postings[term]]
+        docs = np.asarray([doc for doc, _ in pairs], dtype=np.int32)
+        freqs = np.asarray([freq for _, freq in pairs], dtype=np.int32)
+        return cls(np.asarray(terms, dtype=str), indptr, docs, freqs, lengths)
+
+    @classmethod
+    def load(cls, path: str) -> "TermSegment":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["terms"], data["indptr"], data["docs"], data["freqs"], data["lengths"])
+
+    def save(self, file):
+        np.savez(file, terms=self.terms, indptr=self.indptr, docs=self.docs, freqs=self.freqs, lengths=self.lengths)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        row = self._rows.get(term)
+        if row is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.docs[start:end], self.freqs[start:end]
+
+    @property
+    def nbytes(self) -> int:
+        # Arrays plus a rough per-term cost for the lookup dict
+        return self.indptr.nbytes + self.docs.nbytes + self.freqs.nbytes + self.lengths.nbytes + len(self._rows) * 100
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+class SparseIndex:
+    """
+    BM25 search over the term segments of a collection. Positions match the vector
+    index, so results can be fused with dense search. Adding returns a new index and
+    leaves this one untouched for searches in flight.
+    """
+
+    def __init__(self, segments: Sequence[TermSegment] = ()):
+        self.segments = list(segments)
+        self._bases = np.cumsum([0] + [len(segment) for segment in self.segments])
+        self.lengths = (
+            np.concatenate([segment.lengths for segment in self.segments])
+            if self.segments else np.zeros(0, dtype=np.int32)
+        )
+        self.average_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self.segments) + self.lengths.nbytes
+
+    def with_texts(self, texts: Sequence[str]) -> "SparseIndex":
+        return SparseIndex(self.segments + [TermSegment.from_texts(texts)])
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (position, BM25 score) pairs for a query"""
+        count = len(self)
+        if count == 0:
+            return []
+        scores = np.zeros(count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = [
+                (segment_docs + base, freqs)
+                for segment, base in zip(self.segments, self._bases)
+                for segment_docs, freqs in [segment.postings(term)]
+                if len(segment_docs)
+            ]
+            doc_freq = sum(len(docs) for docs, _ in postings)
+            if doc_freq == 0:
+                continue
+            idf = math.log(1 + (count - doc_freq + 0.5) / (doc_freq + 0.5))
+            for docs, freqs in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[docs] / self.average_length)
+                scores[docs] += idf * freqs * (BM25_K1 + 1) / (freqs + norm)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(position), float(scores[position])) for position in matched]
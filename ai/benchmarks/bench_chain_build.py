@@ -0,0 +1,48 @@
+"""
+Per-request RAG chain construction overhead: building a fresh LLM client and chain on
+every request (the old behaviour) versus the cached chain returned by get_rag_chain.
+"""
+import argparse
+import time
+
+from benchmarks.common import (
+    install_fake_embedder, report, sample_documents, use_temp_index_dir,
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    use_temp_index_dir()
+    install_fake_embedder()
+
+    from app.core import rag_chain
+    from app.vector_store.faiss_store import add_documents_to_vector_store, get_vector_store
+
+    collection = "bench_chain"
+    add_documents_to_vector_store(sample_documents(200), collection)
+
+    # Before: new client and chain per request
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        rag_chain.build_rag_chain(get_vector_store(collection), rag_chain.create_llm(), collection)
+    uncached = (time.perf_counter() - start) / args.iterations
+
+    # After: shared client, chain reused until the index changes
+    rag_chain.get_rag_chain(collection)
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        rag_chain.get_rag_chain(collection)
+    cached = (time.perf_counter() - start) / args.iterations
+
+    report({
+        "benchmark": "chain_build",
+        "iterations": args.iterations,
+        "uncached_ms_per_request": round(uncached * 1000, 4),
+        "cached_ms_per_request": round(cached * 1000, 4),
+        "speedup": round(uncached / cached, 1) if cached else None,
+    })
+
+if __name__ == "__main__":
+    main()
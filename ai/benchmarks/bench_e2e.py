@@ -0,0 +1,193 @@
+"""
+End-to-end benchmark through the HTTP API: uploads synthetic PDFs to /upload and waits
+for their ingestion jobs, then runs /chat with N concurrent clients.
+
+Gemini is replaced by a deterministic fake chat model and the embedder by hash-based
+vectors, so results only depend on the code and the machine. Chat history goes through
+the real MongoDB history code against mongomock (`uv pip install mongomock`), or is kept
+in memory if it isn't installed. Ingestion runs in the job threads because the fake
+embedder doesn't exist in worker processes.
+
+Prints one JSON report with upload throughput, chat latency percentiles per client
+count, stage totals and peak RSS; --output also writes it to a file for comparing runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import (
+    install_fake_embedder, install_fake_llm, install_in_memory_history, install_mongomock,
+    make_synthetic_pdf, percentile, report, use_temp_index_dir,
+)
+
+COLLECTION = "bench_e2e"
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process and of any finished worker processes"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(max(usage, children) / scale, 1)
+
+async def upload_all(client, paths: List[str], poll_interval: float) -> Dict:
+    job_ids = []
+    started = time.perf_counter()
+    for path in paths:
+        while True:
+            with open(path, "rb") as f:
+                response = await client.post(
+                    "/upload",
+                    files={"file": (os.path.basename(path), f, "application/pdf")},
+                    data={"session_id": COLLECTION},
+                )
+            if response.status_code != 429:
+                break
+            # Queue full: wait for a job to finish
+            await asyncio.sleep(poll_interval)
+        response.raise_for_status()
+        job_ids.append(response.json()["job_id"])
+
+    jobs = {}
+    while len(jobs) < len(job_ids):
+        for job_id in job_ids:
+            if job_id in jobs:
+                continue
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["stage"] in ("completed", "failed"):
+                jobs[job_id] = job
+        await asyncio.sleep(poll_interval)
+    elapsed = time.perf_counter() - started
+
+    failed = [job["error"] for job in jobs.values() if job["stage"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Ingestion failed: {failed[0]}")
+    pages = sum(job["total_pages"] for job in jobs.values())
+    chunks = sum(job["chunks_total"] for job in jobs.values())
+    megabytes = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+    return {
+        "files": len(paths),
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(len(paths) / elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 2),
+        "chunks_per_sec": round(chunks / elapsed, 2),
+        "mb_per_sec": round(megabytes / elapsed, 3),
+    }
+
+async def run_chat_clients(client, clients: int, requests_per_client: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+
+    async def run_client(client_id: int):
+        nonlocal errors
+        # Sessions search the uploaded collection; the history is per client
+        for i in range(requests_per_client):
+            started = time.perf_counter()
+            response = await client.post("/chat", json={
+                # Distinct questions, so the semantic cache doesn't answer them
+                "query": f"What must be checked for sensor {clients}-{client_id}-{i} within {i + 1} days?",
+                "session_id": f"{COLLECTION}_{clients}_{client_id}",
+                "collections": [COLLECTION],
+            })
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def stage_totals() -> Dict[str, Dict]:
+    from app.utils.metrics import stage_duration
+    return {
+        stage: {"count": count, "seconds": round(seconds, 4)}
+        for (stage,), (count, seconds) in sorted(stage_duration.totals().items())
+    }
+
+async def run(args, paths: List[str]) -> Dict:
+    import httpx
+    from app.main import app
+    from app.utils.metrics import stage_duration
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        upload = await upload_all(client, paths, args.poll_interval)
+        upload["stages"] = stage_totals()
+        upload["peak_rss_mb"] = peak_rss_mb()
+
+        chat = []
+        for clients in args.clients:
+            stage_duration.clear()
+            result = await run_chat_clients(client, clients, args.requests_per_client)
+            result["stages"] = stage_totals()
+            chat.append(result)
+    return {"upload": upload, "chat": chat}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=4, help="synthetic PDFs to upload")
+    parser.add_argument("--pages", type=int, default=25, help="pages per PDF")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-client", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="seconds between /jobs polls")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    from app.config.config import get_settings
+    settings = get_settings()
+
+    use_temp_index_dir()
+    install_fake_embedder()
+    install_fake_llm(latency=args.llm_latency)
+    history = "mongomock" if install_mongomock() else "in_memory"
+    if history == "in_memory":
+        install_in_memory_history()
+        # Job status is shared through MongoDB too
+        settings.INGESTION_JOBS_SHARED = False
+    settings.INGESTION_PROCESSES = 0
+    settings.UPLOAD_TEMP_DIR = tempfile.mkdtemp(prefix="bench_uploads_")
+
+    pdf_dir = tempfile.mkdtemp(prefix="bench_pdfs_")
+    paths = [
+        make_synthetic_pdf(os.path.join(pdf_dir, f"synthetic_{i}.pdf"), args.pages, seed=i)
+        for i in range(args.files)
+    ]
+
+    results = asyncio.run(run(args, paths))
+    results = {
+        "benchmark": "e2e",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "history": history,
+        "llm_latency_s": args.llm_latency,
+        "retrieval_mode": settings.RETRIEVAL_MODE,
+        **results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Embedding throughput (chunks/sec) and peak RSS for each embedding engine configuration
+on a fixed sample corpus. Each configuration runs in a fresh process so model loading
+and peak memory are measured in isolation. Uses the real all-MiniLM-L6-v2 model.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+CONFIGURATIONS = {
+    "torch-default": {},
+    "torch-batch64": {"EMBEDDING_BATCH_SIZE": "64"},
+    "torch-1-thread": {"EMBEDDING_NUM_THREADS": "1"},
+    "torch-4-threads": {"EMBEDDING_NUM_THREADS": "4"},
+    "torch-multi-process": {"EMBEDDING_MULTI_PROCESS_WORKERS": "4", "EMBEDDING_MULTI_PROCESS_MIN_TEXTS": "1"},
+    "onnx": {"EMBEDDING_BACKEND": "onnx"},
+    "onnx-int8": {"EMBEDDING_BACKEND": "onnx-int8"},
+}
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_child(chunks: int):
+    """Embed the sample corpus with the configuration from the environment"""
+    from benchmarks.common import sample_documents
+    from app.ingestion.embedder import get_embedder
+
+    texts = [doc.page_content for doc in sample_documents(chunks, words_per_doc=150)]
+    start = time.perf_counter()
+    embedder = get_embedder()
+    load_seconds = time.perf_counter() - start
+
+    embedder.embed_documents(texts[:32])  # warm up
+    start = time.perf_counter()
+    embedder.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "load_seconds": round(load_seconds, 2),
+        "chunks_per_sec": round(len(texts) / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGURATIONS), choices=list(CONFIGURATIONS))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.chunks)
+        return
+
+    from benchmarks.common import report
+
+    results = []
+    for name in args.configs:
+        env = {**os.environ, **CONFIGURATIONS[name], "EMBEDDING_CACHE_PATH": ""}
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_embedder", "--child", "--chunks", str(args.chunks)],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            results.append({"config": name, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append({"config": name, **json.loads(proc.stdout.strip().splitlines()[-1])})
+
+    report({"benchmark": "embedder", "chunks": args.chunks, "results": results})
+
+if __name__ == "__main__":
+    main()
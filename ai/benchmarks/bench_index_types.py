@@ -0,0 +1,75 @@
+"""
+Recall vs latency of the configurable FAISS index types against the exact flat
+baseline, on a synthetic clustered corpus of normalized 384-d vectors (the shape of
+MiniLM embeddings). Reports recall@k, mean per-query latency, build time and
+approximate index memory.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import report
+
+def synthetic_corpus(count: int, queries: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=count + queries)
+    vectors = centers[assignments] + 0.6 * rng.normal(size=(count + queries, dim)).astype(np.float32)
+    return vectors[:count], vectors[count:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    import faiss
+    from app.config.config import get_settings
+    settings = get_settings()
+    from app.vector_store.index_factory import INDEX_TYPES, build_faiss_index, estimate_index_bytes
+
+    settings.FAISS_METRIC = "cosine"
+    vectors, queries = synthetic_corpus(args.count, args.queries, args.dim, args.clusters)
+    queries = queries.copy()
+    faiss.normalize_L2(queries)
+
+    results = []
+    ground_truth = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+
+        # One query at a time, as in a chat request
+        start = time.perf_counter()
+        found = np.vstack([index.search(queries[i:i + 1], args.k)[1] for i in range(len(queries))])
+        latency = (time.perf_counter() - start) / len(queries)
+
+        if ground_truth is None:
+            ground_truth = found  # flat is exact and runs first
+        recall = np.mean([
+            len(set(found[i]) & set(ground_truth[i])) / args.k for i in range(len(queries))
+        ])
+        results.append({
+            "index_type": index_type,
+            "built_as": type(index).__name__,
+            f"recall_at_{args.k}": round(float(recall), 4),
+            "mean_query_ms": round(latency * 1000, 4),
+            "build_seconds": round(build_seconds, 2),
+            "approx_memory_mb": round(estimate_index_bytes(index) / 1024 / 1024, 1),
+        })
+
+    report({
+        "benchmark": "index_types",
+        "count": args.count,
+        "queries": args.queries,
+        "dim": args.dim,
+        "results": results,
+    })
+
+if __name__ == "__main__":
+    main()
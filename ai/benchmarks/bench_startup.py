@@ -0,0 +1,92 @@
+"""
+Import-time profile of the app: how long `import app.main` takes in a fresh
+interpreter, which packages that time goes to (from `python -X importtime`), and
+whether any heavy ML/LLM library was imported. Those should only load during warm-up,
+so the health route answers as soon as a worker starts.
+
+Each run starts a new process; the reported times are the median over the runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.common import report
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by the warm-up or on first use, never by `import app.main`
+HEAVY_MODULES = [
+    "torch", "transformers", "sentence_transformers", "langchain_huggingface",
+    "langchain_google_genai", "google.genai", "langchain_classic.chains.combine_documents",
+    "faiss", "langchain_community.vectorstores",
+]
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for each `import time:` line"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def profile_once(module: str) -> Dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=AI_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    modules = parse_importtime(result.stderr)
+    packages: Dict[str, int] = {}
+    for name, self_us, _ in modules:
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us
+    return {
+        "wall_s": wall,
+        "import_s": next((cumulative for name, _, cumulative in modules if name == module), 0) / 1e6,
+        "packages": packages,
+        "imported": {name for name, _, _ in modules},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages listed by import time")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    runs = [profile_once(args.module) for _ in range(args.runs)]
+    packages = {
+        package: statistics.median(run["packages"].get(package, 0) for run in runs) / 1000
+        for package in set().union(*(run["packages"] for run in runs))
+    }
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    results = {
+        "benchmark": "startup",
+        "module": args.module,
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "process_wall_ms": round(statistics.median(run["wall_s"] for run in runs) * 1000, 1),
+        "import_ms": round(statistics.median(run["import_s"] for run in runs) * 1000, 1),
+        "modules_imported": len(runs[0]["imported"]),
+        "heavy_modules_imported": [name for name in HEAVY_MODULES if name in runs[0]["imported"]],
+        "slowest_packages_ms": {package: round(ms, 1) for package, ms in slowest},
+    }
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
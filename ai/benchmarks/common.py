@@ -0,0 +1,153 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run benchmarks from the ai/ directory, e.g.:
+    uv run python -m benchmarks.bench_chain_build
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Iterator, AsyncIterator, List, Optional
+
+# Settings() requires these at import time; benchmarks never talk to real services
+for _key, _value in {
+    "GOOGLE_API_KEY": "benchmark",
+    "MONGO_INITDB_ROOT_USERNAME": "benchmark",
+    "MONGO_INITDB_ROOT_PASSWORD": "benchmark",
+    "LOG_LEVEL": "error",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with a fixed per-call latency, standing in for Gemini"""
+
+    latency: float = 0.0
+    answer: str = "This is a deterministic benchmark answer built from the retrieved context."
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self.answer.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self.answer.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+
+def use_temp_index_dir() -> str:
+    """Point the vector store at a throwaway directory"""
+    from app.vector_store import faiss_store
+    faiss_store.INDEX_PATH = tempfile.mkdtemp(prefix="bench_faiss_")
+    faiss_store.index_cache.clear()
+    return faiss_store.INDEX_PATH
+
+def install_fake_embedder(size: int = 384):
+    """Replace the shared MiniLM model with a deterministic fake of the same dimension"""
+    from app.config.config import get_settings
+    settings = get_settings()
+    from app.ingestion import embedder, embedding_cache
+    embedder._embedder = DeterministicFakeEmbedding(size=size)
+    embedder.embed_query_cached.cache_clear()
+    # Fake vectors must never end up in the real embedding cache
+    settings.EMBEDDING_CACHE_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_cache_"), "embeddings.sqlite3")
+    embedding_cache._cache = None
+    return embedder._embedder
+
+def install_fake_llm(latency: float = 0.0) -> FakeChatModel:
+    """Replace the shared Gemini client with a fake one"""
+    from app.core import rag_chain
+    rag_chain._llm = FakeChatModel(latency=latency)
+    rag_chain._chain_cache.clear()
+    return rag_chain._llm
+
+def install_in_memory_history():
+    """Keep chat histories in process instead of MongoDB"""
+    from langchain_core.chat_history import InMemoryChatMessageHistory
+    from app.core import rag_chain
+    from app.core.memory import session_service
+    histories = {}
+
+    def get_history(session_id: str):
+        if session_id not in histories:
+            histories[session_id] = InMemoryChatMessageHistory()
+        return histories[session_id]
+
+    session_service.get_or_create_session_history = get_history
+    rag_chain._chain_cache.clear()
+    return histories
+
+def install_mongomock():
+    """
+    Keep chat histories in mongomock, an in-process MongoDB, so the real history code
+    (windowing, message serialization) runs. Returns False if mongomock isn't installed.
+    """
+    try:
+        import mongomock
+    except ImportError:
+        return False
+    from app.core import memory, rag_chain
+    memory._mongo_client = mongomock.MongoClient()
+    memory.ensure_indexes()
+    rag_chain._chain_cache.clear()
+    return True
+
+def make_synthetic_pdf(path: str, pages: int, seed: int = 0, words_per_page: int = 350):
+    """Write a PDF of reproducible pseudo-prose, one paragraph per page"""
+    from fpdf import FPDF
+    rng = random.Random(seed)
+    vocabulary = sample_documents(1, 14)[0].page_content.split()[2:] + [
+        "the", "of", "and", "must", "be", "checked", "every", "report", "within", "days",
+    ]
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=10)
+    for page in range(pages):
+        pdf.add_page()
+        words = [rng.choice(vocabulary) for _ in range(words_per_page)]
+        pdf.multi_cell(0, 5, f"Document {seed} page {page}. " + " ".join(words) + ".")
+    pdf.output(path)
+    return path
+
+def sample_documents(count: int, words_per_doc: int = 120) -> List[Document]:
+    vocabulary = [
+        "invoice", "warranty", "bearing", "turbine", "contract", "clause", "policy",
+        "voltage", "sensor", "firmware", "latency", "throughput", "pipeline", "schema",
+    ]
+    docs = []
+    for i in range(count):
+        words = [vocabulary[(i * 7 + j * 3) % len(vocabulary)] for j in range(words_per_doc)]
+        docs.append(Document(
+            page_content=f"Section {i}. " + " ".join(words),
+            metadata={"source": "benchmark.pdf", "page": i // 4},
+        ))
+    return docs
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def report(results: Any):
+    print(json.dumps(results, indent=2))
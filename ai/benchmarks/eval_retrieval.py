@@ -0,0 +1,129 @@
+"""
+Offline retrieval evaluation: hit rate@k, MRR and per-query latency of dense, sparse
+(BM25) and hybrid (RRF) retrieval.
+
+By default it builds a synthetic collection of maintenance notes, each with a unique
+part number, and asks two kinds of questions: by identifier ("part PN-12345-K") and
+by description. It uses the real MiniLM model unless --fake-embeddings is given.
+
+An existing collection can be evaluated instead with a JSONL file of
+{"question": ..., "expected": ...} lines, where a hit is a retrieved chunk containing
+the expected text:
+    uv run python -m benchmarks.eval_retrieval --collection <session_id> --queries eval.jsonl
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.common import install_fake_embedder, percentile, report, use_temp_index_dir
+
+COMPONENTS = ["bearing", "gasket", "valve", "impeller", "filter", "coupling", "seal", "rotor", "belt", "nozzle"]
+MACHINES = ["pump", "compressor", "turbine", "conveyor", "mixer", "boiler", "chiller", "press", "lathe", "fan"]
+ACTIONS = ["inspected", "lubricated", "replaced", "cleaned", "calibrated", "tightened", "tested", "aligned", "drained", "flushed"]
+TOOLS = ["torque wrench", "borescope", "grease gun", "multimeter", "feeler gauge", "dial indicator"]
+
+def synthetic_collection(count: int, seed: int = 0):
+    from langchain_core.documents import Document
+    rng = random.Random(seed)
+    combos = rng.sample(
+        [(c, m, a) for c in COMPONENTS for m in MACHINES for a in ACTIONS], count
+    )
+    docs, queries = [], []
+    for i, (component, machine, action) in enumerate(combos):
+        part = f"PN-{rng.randint(10000, 99999)}-{chr(65 + i % 26)}"
+        text = (
+            f"Maintenance note for part {part}. The {component} on the {machine} must be {action} "
+            f"every {rng.choice([250, 500, 1000, 2000])} operating hours using a {rng.choice(TOOLS)}. "
+            "Record the result in the plant maintenance log and report any abnormal wear to the shift supervisor."
+        )
+        docs.append(Document(page_content=text, metadata={"source": "synthetic.pdf", "page": i}))
+        queries.append({"kind": "identifier", "question": f"What tool do I need for part {part}?", "expected": part})
+        queries.append({
+            "kind": "descriptive",
+            "question": f"How often should the {component} on the {machine} be {action}?",
+            "expected": part,
+        })
+    return docs, queries
+
+def evaluate(retriever, queries: List[Dict], k: int) -> Dict[str, Dict]:
+    results: Dict[str, Tuple[List[float], List[float]]] = {}
+    for query in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query["question"])
+        latency = time.perf_counter() - start
+        rank = next((i + 1 for i, doc in enumerate(docs[:k]) if query["expected"] in doc.page_content), None)
+        for kind in {"all", query.get("kind", "all")}:
+            reciprocal_ranks, latencies = results.setdefault(kind, ([], []))
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+            latencies.append(latency)
+    return {
+        kind: {
+            "queries": len(reciprocal_ranks),
+            f"hit_rate_at_{k}": round(sum(1 for rr in reciprocal_ranks if rr) / len(reciprocal_ranks), 4),
+            "mrr": round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        }
+        for kind, (reciprocal_ranks, latencies) in results.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=500, help="synthetic notes (at most 1000)")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--fake-embeddings", action="store_true", help="hash-based vectors instead of MiniLM")
+    parser.add_argument("--collection", help="evaluate an existing collection instead")
+    parser.add_argument("--queries", help="JSONL file of questions for --collection")
+    args = parser.parse_args()
+
+    from app.config.config import get_settings
+    settings = get_settings()
+    from app.vector_store import faiss_store
+    from app.vector_store.retriever import HybridRetriever
+
+    if args.collection:
+        if not args.queries:
+            parser.error("--collection needs --queries")
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+        vector_store = faiss_store.get_vector_store(args.collection)
+        if vector_store is None:
+            parser.error(f"Collection {args.collection} has no index")
+    else:
+        use_temp_index_dir()
+        if args.fake_embeddings:
+            install_fake_embedder()
+        docs, queries = synthetic_collection(args.count)
+        faiss_store.add_documents_to_vector_store(docs, "eval")
+        vector_store = faiss_store.get_vector_store("eval")
+
+    modes = {"dense": (1.0, 0.0), "sparse": (0.0, 1.0), "hybrid": (settings.RETRIEVAL_DENSE_WEIGHT, settings.RETRIEVAL_SPARSE_WEIGHT)}
+    results = {}
+    for mode, (dense_weight, sparse_weight) in modes.items():
+        retriever = HybridRetriever(
+            vector_store=vector_store,
+            k=args.k,
+            fetch_k=args.fetch_k,
+            dense_weight=dense_weight,
+            sparse_weight=sparse_weight,
+            rrf_k=settings.RETRIEVAL_RRF_K,
+        )
+        # Warm up the embedder and caches
+        retriever.invoke(queries[0]["question"])
+        results[mode] = evaluate(retriever, queries, args.k)
+
+    report({
+        "benchmark": "retrieval",
+        "collection": args.collection or "synthetic",
+        "chunks": vector_store.index.ntotal,
+        "fake_embeddings": args.fake_embeddings,
+        "k": args.k,
+        "fetch_k": args.fetch_k,
+        "results": results,
+    })
+
+if __name__ == "__main__":
+    main()
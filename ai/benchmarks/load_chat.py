@@ -0,0 +1,73 @@
+"""
+Chat throughput under concurrent clients, with a fake LLM that sleeps to mimic Gemini
+round trips and chat history kept in memory instead of MongoDB.
+Throughput should scale with the number of clients until CHAT_MAX_CONCURRENCY or the
+CPU pool saturates.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import (
+    install_fake_embedder, install_fake_llm, install_in_memory_history,
+    percentile, report, sample_documents, use_temp_index_dir,
+)
+
+async def run_clients(chat, ChatRequest, clients: int, requests_per_client: int):
+    latencies = []
+
+    async def client(client_id: int):
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            # Distinct questions and a session per client, so the semantic cache doesn't
+            # answer them and every request runs the whole chain
+            await chat(ChatRequest(
+                query=f"What does section {clients}-{client_id}-{i} say about warranty?",
+                session_id=f"bench_load_{clients}_{client_id}",
+                collections=["bench_load"],
+            ))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "requests": clients * requests_per_client,
+        "requests_per_sec": round(clients * requests_per_client / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-client", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    use_temp_index_dir()
+    install_fake_embedder()
+    install_fake_llm(latency=args.llm_latency)
+    install_in_memory_history()
+
+    from app.api.routes.chat import chat
+    from app.models.chat import ChatRequest
+    from app.vector_store.faiss_store import add_documents_to_vector_store
+
+    add_documents_to_vector_store(sample_documents(500), "bench_load")
+
+    async def run_all():
+        return [
+            await run_clients(chat, ChatRequest, clients, args.requests_per_client)
+            for clients in args.clients
+        ]
+
+    report({
+        "benchmark": "load_chat",
+        "llm_latency_s": args.llm_latency,
+        "results": asyncio.run(run_all()),
+    })
+
+if __name__ == "__main__":
+    main()
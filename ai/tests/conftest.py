@@ -0,0 +1,51 @@
+import os
+
+# Settings() requires these; tests never talk to real services
+for _key, _value in {
+    "GOOGLE_API_KEY": "test",
+    "MONGO_INITDB_ROOT_USERNAME": "test",
+    "MONGO_INITDB_ROOT_PASSWORD": "test",
+    "LOG_LEVEL": "error",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from app.config.config import get_settings
+
+EMBEDDING_SIZE = 32
+
+@pytest.fixture
+def settings():
+    """The process settings; change them with monkeypatch so tests don't leak"""
+    return get_settings()
+
+@pytest.fixture
+def fake_embedder(monkeypatch, tmp_path, settings):
+    """Deterministic fake embeddings and a throwaway embedding cache"""
+    from app.ingestion import embedder, embedding_cache
+    fake = DeterministicFakeEmbedding(size=EMBEDDING_SIZE)
+    monkeypatch.setattr(embedder, "_embedder", fake)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(embedding_cache, "_cache", None)
+    embedder.embed_query_cached.cache_clear()
+    yield fake
+    embedder.embed_query_cached.cache_clear()
+
+@pytest.fixture
+def index_dir(monkeypatch, tmp_path):
+    """Point the vector store at a throwaway directory"""
+    from app.vector_store import faiss_store
+    monkeypatch.setattr(faiss_store, "INDEX_PATH", str(tmp_path / "faiss_index"))
+    faiss_store.index_cache.clear()
+    yield faiss_store.INDEX_PATH
+    faiss_store.index_cache.clear()
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """The shared MongoDB client replaced by mongomock, an in-process MongoDB"""
+    mongomock = pytest.importorskip("mongomock")
+    from app.core import memory
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(memory, "_mongo_client", client)
+    return client
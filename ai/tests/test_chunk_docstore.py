@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from app.vector_store.chunk_docstore import ChunkDeletionError, ChunkLogDocstore, PositionalIdMap
+from app.vector_store.segment_store import append_segment, open_chunk_log
+
+@pytest.fixture
+def docstore(tmp_path):
+    records = [{"id": f"id-{i}", "page_content": f"chunk {i}", "metadata": {"page": i}} for i in range(3)]
+    manifest = append_segment(str(tmp_path), records, np.zeros((3, 4), dtype=np.float32))
+    return ChunkLogDocstore(open_chunk_log(str(tmp_path), manifest))
+
+def test_committed_chunks_are_read_by_position(docstore):
+    assert docstore.search(1) == Document(id="id-1", page_content="chunk 1", metadata={"page": 1})
+    assert docstore.search(3) == "ID 3 not found."
+
+def test_added_documents_are_kept_in_memory(docstore):
+    docstore.add({"new": Document(page_content="added")})
+    id_map = PositionalIdMap(3)
+    id_map[3] = "new"
+
+    assert docstore.search(id_map[3]).page_content == "added"
+    assert list(id_map) == [0, 1, 2, 3] and len(id_map) == 4
+    with pytest.raises(ValueError):
+        docstore.add({"new": Document(page_content="again")})
+    with pytest.raises(KeyError):
+        id_map[1] = "other"
+
+def test_chunks_cannot_be_deleted(docstore):
+    id_map = PositionalIdMap(3, {3: "new"})
+
+    with pytest.raises(ChunkDeletionError, match="append-only"):
+        docstore.delete([0])
+    with pytest.raises(ChunkDeletionError):
+        del id_map[3]
+    # Nothing was removed
+    assert docstore.search(0).page_content == "chunk 0"
+    assert len(id_map) == 4
@@ -0,0 +1,58 @@
+import sqlite3
+import pytest
+from app.ingestion import embedding_cache
+from app.ingestion.embedding_cache import (
+    EmbeddingCache, embed_documents_cached, lookup_embeddings, normalize_text, text_hash,
+)
+
+def test_layout_whitespace_shares_an_entry():
+    assert normalize_text("  pump\nXJ-2045 \t manual ") == "pump XJ-2045 manual"
+    assert text_hash("pump  XJ-2045") == text_hash("pump\nXJ-2045")
+    assert text_hash("pump XJ-2045") != text_hash("pump XJ-2046")
+
+def test_entries_are_per_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache" / "embeddings.sqlite3"))
+    cache.put_many("model-a", ["one", "two"], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many("model-a", ["two", "three", "one"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert cache.get_many("model-b", ["one"]) == [None]
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(path).put_many("model", ["one"], [[0.5, 0.25]])
+    assert EmbeddingCache(path).get_many("model", ["one"]) == [[0.5, 0.25]]
+
+def test_lookups_above_the_parameter_limit(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    texts = [f"chunk {i}" for i in range(1200)]
+    cache.put_many("model", texts, [[float(i)] for i in range(1200)])
+    assert cache.get_many("model", texts) == [[float(i)] for i in range(1200)]
+
+def test_only_misses_are_embedded(fake_embedder, monkeypatch):
+    embedded = []
+    embed_documents = fake_embedder.embed_documents
+    monkeypatch.setattr(
+        type(fake_embedder), "embed_documents",
+        lambda self, texts: (embedded.append(list(texts)), embed_documents(texts))[1],
+    )
+
+    first, hits = embed_documents_cached(["alpha", "beta"])
+    assert hits == 0
+    second, hits = embed_documents_cached(["beta", "gamma", "alpha"])
+
+    assert hits == 2
+    assert embedded == [["alpha", "beta"], ["gamma"]]
+    # Stored as float32
+    assert second[0] == pytest.approx(first[1], rel=1e-6)
+    assert second[2] == pytest.approx(first[0], rel=1e-6)
+
+def test_disabled_cache_embeds_everything(fake_embedder, monkeypatch, settings):
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", "")
+    assert lookup_embeddings(["alpha", "beta"]) == ([None, None], [0, 1])
+
+def test_sqlite_errors_are_misses(fake_embedder, monkeypatch):
+    def broken(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(embedding_cache.get_embedding_cache(), "get_many", broken)
+    assert lookup_embeddings(["alpha"]) == ([None], [0])
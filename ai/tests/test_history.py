@@ -0,0 +1,127 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from app.core import memory, rag_chain
+from app.core.memory import HISTORY_KEY, SESSION_ID_KEY, WindowedMongoDBChatMessageHistory
+
+class RecordingChatModel(FakeListChatModel):
+    """Fake LLM that remembers the prompts it was sent"""
+
+    prompts: list = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return f"summary {len(self.prompts)}"
+
+@pytest.fixture
+def llm(monkeypatch):
+    model = RecordingChatModel(responses=[""], prompts=[])
+    monkeypatch.setattr(rag_chain, "_llm", model)
+    # Tests fold explicitly instead of in the background
+    monkeypatch.setattr(memory, "_schedule_summary_update", lambda history: None)
+    return model
+
+def make_history(mongo, **kwargs) -> WindowedMongoDBChatMessageHistory:
+    return WindowedMongoDBChatMessageHistory(
+        connection_string=None,
+        client=mongo,
+        database_name="test",
+        collection_name="chat_histories",
+        session_id="session",
+        session_id_key=SESSION_ID_KEY,
+        history_key=HISTORY_KEY,
+        create_index=False,
+        **kwargs,
+    )
+
+def add_turns(history, first: int, count: int):
+    for turn in range(first, first + count):
+        history.add_messages([HumanMessage(content=f"q{turn}"), AIMessage(content=f"a{turn}")])
+
+def test_window_holds_the_last_turns(mongo):
+    history = make_history(mongo, window_turns=2)
+    add_turns(history, 0, 5)
+    assert [message.content for message in history.messages] == ["q3", "a3", "q4", "a4"]
+    assert len(history.all_messages()) == 10
+
+def test_window_reads_are_limited(mongo, monkeypatch):
+    history = make_history(mongo, window_turns=2)
+    add_turns(history, 0, 50)
+    find = history.collection.find
+    limits = []
+
+    class Cursor:
+        def __init__(self, cursor):
+            self.cursor = cursor
+
+        def sort(self, *args):
+            return Cursor(self.cursor.sort(*args))
+
+        def limit(self, count):
+            limits.append(count)
+            return self.cursor.limit(count)
+
+    monkeypatch.setattr(history.collection, "find", lambda *args: Cursor(find(*args)))
+    history.messages
+    assert limits == [4]
+
+def test_no_window_returns_everything(mongo):
+    history = make_history(mongo, window_turns=0)
+    add_turns(history, 0, 3)
+    assert len(history.messages) == 6
+
+def test_summary_precedes_the_window(mongo, llm):
+    history = make_history(mongo, window_turns=1, summary_enabled=True, summary_min_fold=2)
+    add_turns(history, 0, 2)
+    history.update_summary()
+
+    messages = history.messages
+
+    assert isinstance(messages[0], SystemMessage)
+    assert "summary 1" in messages[0].content
+    assert [message.content for message in messages[1:]] == ["q1", "a1"]
+
+def test_folds_wait_for_enough_messages(mongo, llm):
+    history = make_history(mongo, window_turns=1, summary_enabled=True, summary_min_fold=4)
+    add_turns(history, 0, 2)
+    history.update_summary()
+    # Only one turn has left the window
+    assert llm.prompts == []
+
+    add_turns(history, 2, 1)
+    history.update_summary()
+
+    assert len(llm.prompts) == 1
+    assert "q0" in llm.prompts[0] and "a1" in llm.prompts[0] and "q2" not in llm.prompts[0]
+    # Folded messages aren't folded again
+    history.update_summary()
+    assert len(llm.prompts) == 1
+
+def test_long_backlog_is_folded_in_chunks(mongo, llm):
+    history = make_history(mongo, window_turns=1, summary_enabled=True, summary_min_fold=2, summary_max_fold=4)
+    add_turns(history, 0, 6)
+
+    history.update_summary()
+
+    # 10 messages outside the window, folded 4, 4 and 2 at a time
+    assert len(llm.prompts) == 3
+    assert ["q0" in llm.prompts[0], "q2" in llm.prompts[1], "q4" in llm.prompts[2]] == [True, True, True]
+    assert "summary 2" in llm.prompts[2]
+    assert [message.content for message in history.messages[1:]] == ["q5", "a5"]
+    assert history.collection.count_documents({}) == 12
+
+def test_writes_schedule_a_summary_update(mongo, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(memory, "_schedule_summary_update", scheduled.append)
+    add_turns(make_history(mongo, window_turns=1), 0, 1)
+    history = make_history(mongo, window_turns=1, summary_enabled=True)
+    add_turns(history, 1, 1)
+    assert scheduled == [history]
+
+def test_clear_removes_the_summary(mongo, llm):
+    history = make_history(mongo, window_turns=1, summary_enabled=True, summary_min_fold=2)
+    add_turns(history, 0, 2)
+    history.update_summary()
+    history.clear()
+    assert history.get_summary() is None
+    assert history.messages == []
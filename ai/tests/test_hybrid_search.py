@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from app.vector_store.retriever import HybridRetriever
+from app.vector_store.sparse_index import SparseIndex, TermSegment, tokenize
+
+TEXTS = [
+    "Replace the filter on pump XJ-2045 every 30 days.",
+    "The pump manual covers installation and the pump warranty.",
+    "Sensor calibration is due after each firmware update.",
+    "Check pump XJ-2046 seals monthly.",
+]
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("Check the XJ-2045 pump") == ["check", "xj-2045", "xj", "2045", "pump"]
+
+def test_bm25_ranks_rare_terms_first():
+    index = SparseIndex([TermSegment.from_texts(TEXTS)])
+    results = index.search("pump XJ-2045", k=4)
+    positions = [position for position, _ in results]
+    # The identifier is rarer than "pump", so its chunk wins
+    assert positions[0] == 0
+    assert set(positions) == {0, 1, 3}
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert index.search("unrelated words", k=4) == []
+
+def test_bm25_is_the_same_across_segments_and_merge():
+    whole = SparseIndex([TermSegment.from_texts(TEXTS)])
+    split = SparseIndex([TermSegment.from_texts(TEXTS[:2])]).with_texts(TEXTS[2:])
+    merged = SparseIndex([TermSegment.merge(split.segments)])
+    for query in ("pump", "XJ-2046 seals", "firmware"):
+        expected = whole.search(query, k=4)
+        for index in (split, merged):
+            assert [p for p, _ in index.search(query, k=4)] == [p for p, _ in expected]
+            assert [s for _, s in index.search(query, k=4)] == pytest.approx([s for _, s in expected])
+
+def test_bm25_top_k():
+    index = SparseIndex([TermSegment.from_texts(TEXTS)])
+    assert [position for position, _ in index.search("pump", k=2)] == [
+        position for position, _ in index.search("pump", k=4)[:2]
+    ]
+
+def make_retriever(**kwargs) -> HybridRetriever:
+    ids = [str(i) for i in range(len(TEXTS))]
+    store = SimpleNamespace(
+        docstore=InMemoryDocstore({id: Document(page_content=text) for id, text in zip(ids, TEXTS)}),
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+    return HybridRetriever(vector_store=store, **kwargs)
+
+def test_rrf_rewards_agreement_between_rankings():
+    retriever = make_retriever(k=3, rrf_k=60)
+    results = retriever.fuse(dense=[2, 0, 1], sparse=[0, 3, 2])
+    # 0 is near the top of both, 2 tops one and is last in the other, 3 and 1 appear once
+    assert [doc.page_content for doc, _ in results] == [TEXTS[0], TEXTS[2], TEXTS[3]]
+    assert results[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+def test_rrf_weights():
+    retriever = make_retriever(k=2, dense_weight=0.0, sparse_weight=1.0)
+    results = retriever.fuse(dense=[], sparse=[3, 1])
+    assert [doc.page_content for doc, _ in results] == [TEXTS[3], TEXTS[1]]
+    assert [score for _, score in results] == pytest.approx([1 / 61, 1 / 62])
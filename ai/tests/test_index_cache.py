@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+import faiss
+import numpy as np
+from app.vector_store.index_cache import IndexCache, estimate_vector_store_bytes
+
+DIM = 4
+
+def make_store(vectors: int):
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.zeros((vectors, DIM), dtype=np.float32))
+    return SimpleNamespace(index=index, docstore=SimpleNamespace(_dict={}), sparse_index=None)
+
+def test_store_size_estimate():
+    assert estimate_vector_store_bytes(make_store(10)) == 10 * DIM * 4
+
+def test_evicts_least_recently_used_by_bytes():
+    # Room for two stores of 10 vectors
+    cache = IndexCache(max_bytes=2 * 10 * DIM * 4)
+    removed = []
+    cache.add_removal_listener(removed.append)
+    a, b, c = make_store(10), make_store(10), make_store(10)
+
+    cache.put("a", a, 1)
+    cache.put("b", b, 1)
+    assert cache.get("a", 1) is a
+    cache.put("c", c, 1)
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is a
+    assert cache.get("c", 1) is c
+    assert removed == ["b"]
+    assert cache.stats()["bytes"] == 2 * 10 * DIM * 4
+    assert cache.stats()["evictions"] == 1
+
+def test_does_not_cache_store_larger_than_cache():
+    cache = IndexCache(max_bytes=10 * DIM * 4)
+    cache.put("big", make_store(11), 1)
+    assert cache.get("big", 1) is None
+    assert cache.stats()["bytes"] == 0
+
+def test_version_change_invalidates():
+    cache = IndexCache(max_bytes=1 << 20)
+    removed = []
+    cache.add_removal_listener(removed.append)
+    store = make_store(5)
+    cache.put("a", store, 1)
+
+    assert cache.holds("a", store)
+    assert cache.get("a", 2) is None
+    assert not cache.holds("a", store)
+    assert removed == ["a"]
+    assert cache.stats()["entries"] == 0
+
+def test_invalidate_and_replace_notify():
+    cache = IndexCache(max_bytes=1 << 20)
+    removed = []
+    cache.add_removal_listener(removed.append)
+    cache.put("a", make_store(5), 1)
+    cache.put("a", make_store(6), 2)
+    cache.invalidate("a")
+    cache.invalidate("a")
+    assert removed == ["a", "a"]
+    assert cache.stats()["bytes"] == 0
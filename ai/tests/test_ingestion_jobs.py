@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.ingestion import jobs
+from app.ingestion.jobs import IngestionJobManager, QueueFullError
+
+def make_pdf(path, pages: int = 4) -> str:
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=10)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 5, " ".join(f"Page {page} sentence {i} about pump XJ-{i:04d}." for i in range(60)))
+    pdf.output(str(path))
+    return str(path)
+
+def wait_for(manager: IngestionJobManager, job_id: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.stage in ("completed", "failed"):
+            return job
+        time.sleep(0.02)
+    raise TimeoutError(f"Job {job_id} did not finish")
+
+@pytest.fixture
+def manager(monkeypatch, settings, fake_embedder, index_dir):
+    monkeypatch.setattr(settings, "INGESTION_PROCESSES", 0)
+    monkeypatch.setattr(settings, "INGESTION_JOBS_SHARED", False)
+    monkeypatch.setattr(settings, "EMBEDDING_MULTI_PROCESS_WORKERS", 0)
+    manager = IngestionJobManager()
+    yield manager
+    manager.shutdown()
+
+def test_job_ingests_pdf_and_removes_it(manager, tmp_path):
+    from app.vector_store.faiss_store import get_vector_store
+    path = make_pdf(tmp_path / "upload.pdf")
+
+    job = wait_for(manager, manager.submit(path, "manual.pdf", "session").job_id)
+
+    assert job.stage == "completed", job.error
+    assert job.total_pages == job.pages_processed == 4
+    assert job.chunks_total == job.chunks_embedded > 0
+    assert not os.path.exists(path)
+    store = get_vector_store("session")
+    assert store.index.ntotal == job.chunks_total
+    assert store.docstore.search(0).metadata["source"] == "manual.pdf"
+
+def test_reingesting_hits_the_embedding_cache(manager, tmp_path):
+    first = wait_for(manager, manager.submit(make_pdf(tmp_path / "a.pdf"), "a.pdf", "session").job_id)
+    second = wait_for(manager, manager.submit(make_pdf(tmp_path / "b.pdf"), "b.pdf", "session").job_id)
+    assert first.embedding_cache_hit_ratio == 0
+    assert second.embedding_cache_hit_ratio == 1
+
+def test_failed_job_reports_error_and_frees_its_slot(manager, monkeypatch, settings, tmp_path):
+    monkeypatch.setattr(settings, "INGESTION_QUEUE_DEPTH", 1)
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+
+    job = wait_for(manager, manager.submit(str(path), "broken.pdf", "session").job_id)
+
+    assert job.stage == "failed" and job.error
+    assert not path.exists()
+    # The slot is free again
+    wait_for(manager, manager.submit(make_pdf(tmp_path / "ok.pdf"), "ok.pdf", "session").job_id)
+
+def test_full_queue_rejects_jobs(manager, monkeypatch, settings, tmp_path):
+    monkeypatch.setattr(settings, "INGESTION_QUEUE_DEPTH", 1)
+    release = threading.Event()
+    run_job = manager._run_job
+
+    def blocked_run_job(job_id, file_path):
+        release.wait(10)
+        run_job(job_id, file_path)
+
+    monkeypatch.setattr(manager, "_run_job", blocked_run_job)
+    first = manager.submit(make_pdf(tmp_path / "a.pdf"), "a.pdf", "session")
+    with pytest.raises(QueueFullError):
+        manager.submit(make_pdf(tmp_path / "b.pdf"), "b.pdf", "session")
+
+    release.set()
+    assert wait_for(manager, first.job_id).stage == "completed"
+    wait_for(manager, manager.submit(make_pdf(tmp_path / "c.pdf"), "c.pdf", "session").job_id)
+
+def test_upload_returns_429_when_queue_is_full(monkeypatch, settings, tmp_path):
+    from app.api.routes import document
+    monkeypatch.setattr(settings, "UPLOAD_TEMP_DIR", str(tmp_path))
+
+    def full(*args):
+        raise QueueFullError("Ingestion queue is full, try again later")
+
+    monkeypatch.setattr(document.job_manager, "submit", full)
+    app = FastAPI()
+    app.include_router(document.router)
+
+    response = TestClient(app).post(
+        "/upload", files={"file": ("manual.pdf", b"%PDF-1.4", "application/pdf")}, data={"session_id": "s"}
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    # The upload was never queued, so its temp file is gone
+    assert os.listdir(tmp_path) == []
+
+def test_stage_changes_are_published_once(manager, monkeypatch, settings, tmp_path):
+    monkeypatch.setattr(settings, "INGESTION_JOBS_SHARED", True)
+    monkeypatch.setattr(settings, "INGESTION_EMBED_BATCH_SIZE", 2)
+    # Only forced writes go through
+    monkeypatch.setattr(jobs, "PUBLISH_INTERVAL", 3600)
+    saved = []
+    monkeypatch.setattr(jobs.job_status_store, "save", lambda job: saved.append(job.stage))
+    monkeypatch.setattr(jobs.job_status_store, "active_jobs", lambda: 0)
+
+    job = wait_for(manager, manager.submit(make_pdf(tmp_path / "a.pdf"), "a.pdf", "session").job_id)
+
+    assert job.chunks_total > 2 * 2
+    assert saved == ["queued", "loading", "embedding", "indexing", "completed"]
+
+def test_shared_status_and_queue_depth_across_workers(mongo, manager, monkeypatch, settings, tmp_path):
+    monkeypatch.setattr(settings, "INGESTION_JOBS_SHARED", True)
+    monkeypatch.setattr(settings, "INGESTION_QUEUE_DEPTH", 1)
+    release = threading.Event()
+    run_job = manager._run_job
+    monkeypatch.setattr(manager, "_run_job", lambda job_id, path: (release.wait(10), run_job(job_id, path)))
+    other_worker = IngestionJobManager()
+
+    try:
+        job = manager.submit(make_pdf(tmp_path / "a.pdf"), "a.pdf", "session")
+        # Another worker answers polls for the job and counts it against the queue
+        assert other_worker.get(job.job_id).stage in ("queued", "loading")
+        with pytest.raises(QueueFullError):
+            other_worker.submit(make_pdf(tmp_path / "b.pdf"), "b.pdf", "session")
+        release.set()
+        wait_for(manager, job.job_id)
+        assert other_worker.get(job.job_id).stage == "completed"
+    finally:
+        release.set()
+        other_worker.shutdown()
+
+def test_job_writes_batches_as_they_are_embedded(manager, monkeypatch, settings, tmp_path, index_dir):
+    from app.vector_store import segment_store
+    from app.vector_store.faiss_store import get_index_path, get_vector_store, index_cache
+    monkeypatch.setattr(settings, "INGESTION_EMBED_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "INDEX_COMPACTION_SEGMENTS", 1000)
+    monkeypatch.setattr(settings, "INDEX_SNAPSHOT_MIN_VECTORS", 100000)
+    first = wait_for(manager, manager.submit(make_pdf(tmp_path / "a.pdf", pages=1), "a.pdf", "session").job_id)
+    # Cached, so the next job extends the loaded store instead of reloading it
+    cached = get_vector_store("session")
+    misses = index_cache.misses
+    staged = []
+    append = segment_store.PendingSegments.append
+    monkeypatch.setattr(
+        segment_store.PendingSegments, "append",
+        lambda self, records, vectors: (staged.append(len(records)), append(self, records, vectors)),
+    )
+
+    second = wait_for(manager, manager.submit(make_pdf(tmp_path / "b.pdf", pages=3), "b.pdf", "session").job_id)
+
+    assert second.stage == "completed", second.error
+    assert len(staged) > 1 and max(staged) <= 4
+    manifest = segment_store.read_manifest(get_index_path("session"))
+    assert [segment["count"] for segment in manifest["segments"][1:]] == staged
+    store = get_vector_store("session")
+    assert store is not cached and index_cache.misses == misses
+    assert store.index.ntotal == first.chunks_total + second.chunks_total
+    assert store.docstore.search(store.index.ntotal - 1).metadata["source"] == "b.pdf"
+    assert store.similarity_search("Page 2 sentence 59", k=1)
+
+def test_failed_job_leaves_no_chunks_behind(manager, monkeypatch, settings, tmp_path, index_dir):
+    from app.vector_store.faiss_store import get_index_path, get_index_version
+    batches = []
+
+    def fail_on_second_batch(texts):
+        batches.append(texts)
+        if len(batches) == 2:
+            raise RuntimeError("embedding failed")
+        return [[0.1] * 32 for _ in texts]
+
+    monkeypatch.setattr(jobs, "_embed", fail_on_second_batch)
+    monkeypatch.setattr(settings, "INGESTION_EMBED_BATCH_SIZE", 2)
+
+    job = wait_for(manager, manager.submit(make_pdf(tmp_path / "a.pdf"), "a.pdf", "session").job_id)
+
+    assert job.stage == "failed"
+    assert get_index_version("session") is None
+    assert os.listdir(get_index_path("session")) == []
@@ -0,0 +1,77 @@
+import json
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.utils import metrics
+from app.utils.metrics import RequestMetricsMiddleware, request_duration, span, stage_duration
+
+@pytest.fixture
+def client():
+    request_duration.clear()
+    stage_duration.clear()
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with span("faiss_search"):
+            return {"item_id": item_id}
+
+    @app.get("/stream")
+    def stream():
+        def body():
+            with span("answer_generation"):
+                yield "token "
+        return StreamingResponse(body())
+
+    @app.get("/broken")
+    def broken():
+        raise RuntimeError("boom")
+
+    yield TestClient(app, raise_server_exceptions=False)
+    request_duration.clear()
+    stage_duration.clear()
+
+def test_request_id_is_echoed_or_generated(client):
+    assert client.get("/items/1", headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+    generated = client.get("/items/1").headers["X-Request-ID"]
+    assert generated and generated != "abc-123"
+
+def test_requests_are_timed_by_route_template(client):
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    client.get("/broken")
+
+    totals = request_duration.totals()
+    assert totals[("GET", "/items/{item_id}", "200")][0] == 2
+    assert totals[("GET", "unmatched", "404")][0] == 1
+    assert totals[("GET", "/broken", "500")][0] == 1
+    assert stage_duration.totals()[("faiss_search",)][0] == 2
+    assert 'rag_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in (
+        metrics.render_metrics()
+    )
+
+def test_unsampled_requests_record_no_stages(client, monkeypatch, settings):
+    monkeypatch.setattr(settings, "METRICS_SAMPLE_RATE", 0.0)
+    client.get("/items/1")
+    assert stage_duration.totals() == {}
+    # Request latency is always recorded
+    assert request_duration.totals()[("GET", "/items/{item_id}", "200")][0] == 1
+
+def test_one_json_log_line_per_request(client, monkeypatch, settings, caplog):
+    monkeypatch.setattr(settings, "REQUEST_LOG_ENABLED", True)
+    caplog.set_level(logging.INFO, logger="app.requests")
+    # The app's logging setup sends these lines straight to stdout
+    monkeypatch.setattr(logging.getLogger("app.requests"), "propagate", True)
+
+    client.get("/stream", headers={"X-Request-ID": "streamed"})
+
+    [line] = [json.loads(record.getMessage()) for record in caplog.records if record.name == "app.requests"]
+    assert line["request_id"] == "streamed"
+    assert line["kind"] == "http"
+    assert (line["method"], line["route"], line["status"]) == ("GET", "/stream", 200)
+    # The streamed body is part of the request
+    assert line["stages"]["answer_generation"]["count"] == 1
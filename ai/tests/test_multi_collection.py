@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import pytest
+from langchain_core.documents import Document
+from app.vector_store import retriever as retriever_module
+from app.vector_store.faiss_store import add_documents_to_vector_store, get_vector_store
+from app.vector_store.retriever import create_multi_collection_retriever
+
+COLLECTIONS = {
+    "manuals": ["Replace the filter on pump XJ-2045 every 30 days.", "The pump warranty lasts two years."],
+    "shared_kb": ["Sensor calibration is due after each firmware update.", "Check pump XJ-2046 seals monthly."],
+}
+
+@pytest.fixture
+def stores(monkeypatch, settings, fake_embedder, index_dir):
+    monkeypatch.setattr(settings, "RETRIEVAL_MODE", "dense")
+    monkeypatch.setattr(settings, "RETRIEVAL_K", 3)
+    for name, texts in COLLECTIONS.items():
+        add_documents_to_vector_store([Document(page_content=text) for text in texts], name)
+    return [(name, get_vector_store(name)) for name in COLLECTIONS]
+
+@pytest.fixture
+def slow_collection(monkeypatch, stores):
+    """Searches of the shared_kb collection block until released"""
+    release = threading.Event()
+    scored_search = retriever_module._scored_search
+
+    def search(retriever, query, embedding):
+        if retriever.vectorstore is stores[1][1]:
+            release.wait(10)
+        return scored_search(retriever, query, embedding)
+
+    monkeypatch.setattr(retriever_module, "_scored_search", search)
+    yield release
+    release.set()
+
+def test_results_are_merged_by_score_across_collections(monkeypatch, settings, stores):
+    monkeypatch.setattr(settings, "FANOUT_LATENCY_BUDGET_MS", None)
+    retriever = create_multi_collection_retriever(stores)
+
+    for query, collection in (
+        ("Check pump XJ-2046 seals monthly.", "shared_kb"),
+        ("The pump warranty lasts two years.", "manuals"),
+    ):
+        docs = retriever.invoke(query)
+        assert len(docs) == 3
+        # The exact match scores best, whichever collection holds it
+        assert docs[0].page_content == query
+        assert docs[0].metadata["collection"] == collection
+        assert {doc.metadata["collection"] for doc in docs} == set(COLLECTIONS)
+    # The stores' own documents are left untouched
+    assert "collection" not in stores[0][1].docstore.search(0).metadata
+
+def test_slow_collections_are_dropped_after_the_budget(monkeypatch, settings, stores, slow_collection):
+    monkeypatch.setattr(settings, "FANOUT_LATENCY_BUDGET_MS", 50)
+    retriever = create_multi_collection_retriever(stores)
+
+    docs = retriever.invoke("Check pump XJ-2046 seals monthly.")
+    assert {doc.metadata["collection"] for doc in docs} == {"manuals"}
+
+    docs = asyncio.run(retriever.ainvoke("Check pump XJ-2046 seals monthly."))
+    assert {doc.metadata["collection"] for doc in docs} == {"manuals"}
+
+def test_waits_for_the_first_answer_when_none_is_within_budget(monkeypatch, settings, stores, slow_collection):
+    monkeypatch.setattr(settings, "FANOUT_LATENCY_BUDGET_MS", 50)
+    retriever = create_multi_collection_retriever(stores[1:])
+    threading.Timer(0.2, slow_collection.set).start()
+
+    docs = retriever.invoke("Check pump XJ-2046 seals monthly.")
+
+    assert docs[0].metadata["collection"] == "shared_kb"
+
+def test_failing_collection_is_skipped(monkeypatch, settings, stores):
+    monkeypatch.setattr(settings, "FANOUT_LATENCY_BUDGET_MS", None)
+    scored_search = retriever_module._scored_search
+
+    def search(retriever, query, embedding):
+        if retriever.vectorstore is stores[1][1]:
+            raise RuntimeError("index unavailable")
+        return scored_search(retriever, query, embedding)
+
+    monkeypatch.setattr(retriever_module, "_scored_search", search)
+    docs = create_multi_collection_retriever(stores).invoke("Check pump XJ-2046 seals monthly.")
+
+    assert [doc.metadata["collection"] for doc in docs] == ["manuals", "manuals"]
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from app.core import rewrite
+from app.core.rewrite import RewriteStats, create_standalone_question_chain, needs_rewrite
+from app.utils.metrics import question_rewrites
+
+HISTORY = [HumanMessage(content="What is the warranty on the XJ-100 pump?"), AIMessage(content="Two years.")]
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = RewriteStats()
+    monkeypatch.setattr(rewrite, "rewrite_stats", stats)
+    question_rewrites.clear()
+    yield stats
+    question_rewrites.clear()
+
+def test_first_question_is_never_rewritten(monkeypatch, settings):
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_POLICY", "always")
+    assert not needs_rewrite("What does it cost?", [])
+
+@pytest.mark.parametrize("question, expected", [
+    ("How much does it cost?", True),
+    ("And the XJ-200 model?", True),
+    ("Price in euros?", True),
+    ("What is the maximum flow rate of the XJ-200 pump?", False),
+])
+def test_heuristic_rewrites_only_dependent_questions(monkeypatch, settings, question, expected):
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_POLICY", "heuristic")
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_SIMILARITY_THRESHOLD", None)
+    assert needs_rewrite(question, HISTORY) is expected
+
+@pytest.mark.parametrize("policy, expected", [("always", True), ("never", False)])
+def test_policy_overrides_the_heuristic(monkeypatch, settings, policy, expected):
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_POLICY", policy)
+    assert needs_rewrite("How much does it cost?", HISTORY) is expected
+    assert needs_rewrite("What is the maximum flow rate of the XJ-200 pump?", HISTORY) is expected
+
+def test_similar_question_is_rewritten(monkeypatch, settings, fake_embedder):
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_POLICY", "heuristic")
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_SIMILARITY_THRESHOLD", 0.99)
+    # Fake embeddings: identical texts are identical vectors, different ones unrelated
+    assert needs_rewrite("What is the warranty on the XJ-100 pump?", HISTORY)
+    assert not needs_rewrite("What is the maximum flow rate of the XJ-200 pump?", HISTORY)
+
+def test_chain_calls_the_llm_only_when_needed(monkeypatch, settings, stats):
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_POLICY", "heuristic")
+    monkeypatch.setattr(settings, "QUESTION_REWRITE_SIMILARITY_THRESHOLD", None)
+    llm = FakeListChatModel(responses=["How much does the XJ-100 pump cost?"])
+    chain = create_standalone_question_chain(llm)
+    standalone = "What is the maximum flow rate of the XJ-200 pump?"
+
+    assert chain.invoke({"input": standalone, "chat_history": []}) == standalone
+    assert chain.invoke({"input": standalone, "chat_history": HISTORY}) == standalone
+    assert chain.invoke({"input": "How much does it cost?", "chat_history": HISTORY}) == (
+        "How much does the XJ-100 pump cost?"
+    )
+
+    assert stats.stats() == {
+        "policy": "heuristic",
+        "rewritten": 1,
+        "skipped_no_history": 1,
+        "skipped_standalone": 1,
+        "rewrite_rate": pytest.approx(1 / 3),
+    }
+
+def test_rewrite_counts_are_exported_on_metrics(stats):
+    from app.api.routes import system
+    stats.record("rewritten")
+    stats.record("skipped_standalone")
+    stats.record("skipped_standalone")
+    app = FastAPI()
+    app.include_router(system.router)
+
+    body = TestClient(app).get("/metrics").text
+
+    assert "# TYPE rag_question_rewrites_total counter" in body
+    assert 'rag_question_rewrites_total{outcome="rewritten"} 1' in body
+    assert 'rag_question_rewrites_total{outcome="skipped_standalone"} 2' in body
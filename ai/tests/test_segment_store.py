@@ -0,0 +1,155 @@
+import os
+import faiss
+import numpy as np
+import pytest
+from app.vector_store import segment_store
+from app.vector_store.segment_store import (
+    PENDING_PREFIX, PendingSegments, append_segment, compact_segments, committed_count, load_sparse_index,
+    load_vectors, open_chunk_log, read_manifest,
+)
+
+DIM = 8
+
+def make_batch(start: int, count: int):
+    records = [{"page_content": f"chunk {i} part XJ-{i:04d}", "metadata": {"page": i}} for i in range(start, start + count)]
+    vectors = np.random.default_rng(start).random((count, DIM), dtype=np.float32)
+    return records, vectors
+
+def assert_store(index_path: str, records, vectors):
+    manifest = read_manifest(index_path)
+    assert committed_count(manifest) == len(records)
+    np.testing.assert_array_equal(load_vectors(index_path, manifest), vectors)
+    chunks = open_chunk_log(index_path, manifest)
+    assert [chunks.record(i) for i in range(len(chunks))] == records
+    assert len(load_sparse_index(index_path, manifest, chunks)) == len(records)
+
+def test_append_adds_one_segment_per_write(tmp_path):
+    index_path = str(tmp_path)
+    first_records, first_vectors = make_batch(0, 3)
+    second_records, second_vectors = make_batch(3, 2)
+
+    append_segment(index_path, first_records, first_vectors)
+    manifest = append_segment(index_path, second_records, second_vectors)
+
+    assert [segment["count"] for segment in manifest["segments"]] == [3, 2]
+    assert_store(index_path, first_records + second_records, np.vstack([first_vectors, second_vectors]))
+
+def test_append_rejects_other_dimension(tmp_path):
+    records, vectors = make_batch(0, 2)
+    append_segment(str(tmp_path), records, vectors)
+    with pytest.raises(ValueError):
+        append_segment(str(tmp_path), records, np.zeros((2, DIM + 1), dtype=np.float32))
+
+def test_crash_before_manifest_keeps_previous_state(tmp_path, monkeypatch):
+    index_path = str(tmp_path)
+    records, vectors = make_batch(0, 3)
+    append_segment(index_path, records, vectors)
+
+    def crash(*args):
+        raise OSError("crashed before commit")
+
+    lost_records, lost_vectors = make_batch(3, 2)
+    with monkeypatch.context() as patch:
+        patch.setattr(segment_store, "_write_manifest", crash)
+        with pytest.raises(OSError):
+            append_segment(index_path, lost_records, lost_vectors)
+
+    # The orphaned segment and the log tail are ignored on load...
+    assert_store(index_path, records, vectors)
+
+    # ...and overwritten by the next write
+    next_records, next_vectors = make_batch(5, 2)
+    append_segment(index_path, next_records, next_vectors)
+    assert_store(index_path, records + next_records, np.vstack([vectors, next_vectors]))
+
+def test_compaction_merges_segments_and_reloads(tmp_path):
+    index_path = str(tmp_path)
+    all_records, all_vectors = [], []
+    for start in (0, 3, 6):
+        records, vectors = make_batch(start, 3)
+        append_segment(index_path, records, vectors)
+        all_records += records
+        all_vectors.append(vectors)
+    before = read_manifest(index_path)
+
+    def write_snapshot(vectors, path):
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(np.ascontiguousarray(vectors))
+        faiss.write_index(index, path)
+        return {"type": "flat"}
+
+    compact_segments(index_path, write_snapshot)
+
+    manifest = read_manifest(index_path)
+    assert len(manifest["segments"]) == 1
+    assert manifest["snapshot"]["count"] == 9
+    assert faiss.read_index(os.path.join(index_path, manifest["snapshot"]["file"])).ntotal == 9
+    for segment in before["segments"]:
+        assert not os.path.exists(os.path.join(index_path, segment["file"]))
+        assert not os.path.exists(os.path.join(index_path, segment["terms"]))
+    assert_store(index_path, all_records, np.vstack(all_vectors))
+
+    # Appends after compaction land in a new segment past the snapshot
+    records, vectors = make_batch(9, 2)
+    manifest = append_segment(index_path, records, vectors)
+    assert [segment["count"] for segment in manifest["segments"]] == [9, 2]
+    np.testing.assert_array_equal(load_vectors(index_path, manifest, start=9), vectors)
+    assert_store(index_path, all_records + records, np.vstack(all_vectors + [vectors]))
+
+def test_pending_segments_commit_at_once(tmp_path):
+    index_path = str(tmp_path)
+    records, vectors = make_batch(0, 3)
+    append_segment(index_path, records, vectors)
+    before = read_manifest(index_path)
+
+    pending = PendingSegments(index_path)
+    batches = [make_batch(3, 2), make_batch(5, 4)]
+    for batch_records, batch_vectors in batches:
+        pending.append(batch_records, batch_vectors)
+    # Nothing is visible until the commit
+    assert read_manifest(index_path) == before
+
+    manifest = pending.commit()
+
+    assert [segment["count"] for segment in manifest["segments"]] == [3, 2, 4]
+    assert not os.path.exists(pending.directory)
+    assert_store(
+        index_path,
+        records + [r for batch_records, _ in batches for r in batch_records],
+        np.vstack([vectors] + [v for _, v in batches]),
+    )
+
+def test_pending_segments_discard_leaves_collection_untouched(tmp_path):
+    index_path = str(tmp_path)
+    records, vectors = make_batch(0, 3)
+    append_segment(index_path, records, vectors)
+
+    pending = PendingSegments(index_path)
+    pending.append(*make_batch(3, 2))
+    pending.discard()
+
+    assert not any(name.startswith(PENDING_PREFIX) for name in os.listdir(index_path))
+    assert_store(index_path, records, vectors)
+
+def test_pending_segments_reject_other_dimension(tmp_path):
+    pending = PendingSegments(str(tmp_path))
+    pending.append(*make_batch(0, 2))
+    with pytest.raises(ValueError):
+        pending.append(make_batch(2, 2)[0], np.zeros((2, DIM + 1), dtype=np.float32))
+    pending.discard()
+
+def test_compaction_removes_abandoned_uploads(tmp_path):
+    index_path = str(tmp_path)
+    abandoned = PendingSegments(index_path)
+    abandoned.append(*make_batch(0, 2))
+    old = os.path.getmtime(abandoned.directory) - segment_store.PENDING_MAX_AGE - 1
+    os.utime(abandoned.directory, (old, old))
+    active = PendingSegments(index_path)
+    for start in (0, 3):
+        append_segment(index_path, *make_batch(start, 3))
+
+    compact_segments(index_path)
+
+    assert not os.path.exists(abandoned.directory)
+    assert os.path.exists(active.directory)
+    active.discard()
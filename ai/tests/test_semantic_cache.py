@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from app.core import semantic_cache as semantic_cache_module
+from app.core.semantic_cache import SemanticAnswerCache, question_identifiers, with_semantic_cache
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def put(cache, question, vector, version=1, collection="manuals"):
+    cache.put(collection, question, vector, f"answer to {question}", [Document(page_content="context")], version)
+
+def test_hit_above_threshold_only():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    put(cache, "how do I reset the pump", unit(1, 0, 0))
+
+    hit = cache.lookup("manuals", unit(1, 0.1, 0), 1)
+    assert hit is not None and hit.answer == "answer to how do I reset the pump"
+    assert cache.lookup("manuals", unit(1, 1, 0), 1) is None
+    # Collections don't share answers
+    assert cache.lookup("other", unit(1, 0, 0), 1) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_questions_naming_different_identifiers_never_match():
+    cache = SemanticAnswerCache(threshold=0.5, ttl_seconds=60, max_entries=10)
+    put(cache, "price of part PN-1001", unit(1, 0, 0))
+
+    assert "pn-1001" in question_identifiers("price of part PN-1001")
+    assert cache.lookup("manuals", unit(1, 0, 0), 1, question_identifiers("price of part PN-1002")) is None
+    assert cache.lookup("manuals", unit(1, 0, 0), 1, question_identifiers("price of part PN-1001")) is not None
+
+def test_entries_are_dropped_when_the_index_changes():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    put(cache, "how do I reset the pump", unit(1, 0, 0), version=1)
+    put(cache, "how do I reset the pump", unit(1, 0, 0), version=1, collection="other")
+
+    assert cache.lookup("manuals", unit(1, 0, 0), 2) is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    # Only the changed collection is invalidated
+    assert stats["entries"] == 1
+    assert cache.lookup("other", unit(1, 0, 0), 1) is not None
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", lambda: now[0])
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    put(cache, "how do I reset the pump", unit(1, 0, 0))
+
+    now[0] += 59
+    assert cache.lookup("manuals", unit(1, 0, 0), 1) is not None
+    now[0] += 2
+    assert cache.lookup("manuals", unit(1, 0, 0), 1) is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=2)
+    put(cache, "first", unit(1, 0, 0))
+    put(cache, "second", unit(0, 1, 0))
+    cache.lookup("manuals", unit(1, 0, 0), 1)
+    put(cache, "third", unit(0, 0, 1))
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup("manuals", unit(0, 1, 0), 1) is None
+    assert cache.lookup("manuals", unit(1, 0, 0), 1).question == "first"
+
+@pytest.fixture
+def shared_cache(monkeypatch, fake_embedder):
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    monkeypatch.setattr(semantic_cache_module, "semantic_cache", cache)
+    return cache
+
+def test_chain_answers_repeated_questions_from_the_cache(shared_cache):
+    calls = []
+    version = [1]
+
+    def answer(inputs):
+        calls.append(inputs["standalone_question"])
+        return {**inputs, "context": [], "answer": f"answer {len(calls)}"}
+
+    chain = with_semantic_cache(RunnableLambda(answer), "manuals", lambda: version[0])
+    question = {"standalone_question": "How do I reset the XJ-100 pump?"}
+
+    assert chain.invoke(question)["answer"] == "answer 1"
+    assert chain.invoke(question)["answer"] == "answer 1"
+    assert len(calls) == 1
+    # A new upload changes the index version, so the answer is computed again
+    version[0] = 2
+    assert chain.invoke(question)["answer"] == "answer 2"
+    assert len(calls) == 2
@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from app.core import memory
+from app.core.memory import SessionService, TEMP_SESSION_ID
+
+@pytest.fixture
+def service(mongo):
+    memory.ensure_indexes()
+    return SessionService()
+
+def chat(service: SessionService, session_id: str, turns: int = 1):
+    history = service.get_or_create_session_history(session_id)
+    for turn in range(turns):
+        history.add_messages([HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn} in {session_id}")])
+
+def all_pages(service: SessionService, limit: int):
+    pages, after = [], None
+    while True:
+        sessions, after = service.list_sessions(limit=limit, after=after)
+        pages.append([session["session_id"] for session in sessions])
+        if after is None:
+            return pages
+
+def test_sessions_most_recently_active_first(service):
+    chat(service, "a", turns=2)
+    chat(service, "b")
+    chat(service, "c")
+    chat(service, "a")
+
+    sessions, after = service.list_sessions()
+
+    assert [session["session_id"] for session in sessions] == ["a", "c", "b"]
+    assert after is None
+    assert sessions[0]["message_count"] == 6
+    assert sessions[0]["preview"] == "answer 0 in a..."
+    assert sessions[0]["created_at"] <= sessions[0]["updated_at"]
+
+def test_pages_cover_every_session_once(service):
+    for i in range(7):
+        chat(service, f"s{i}")
+    assert all_pages(service, limit=3) == [["s6", "s5", "s4"], ["s3", "s2", "s1"], ["s0"]]
+
+def test_temp_session_is_not_listed(service):
+    chat(service, TEMP_SESSION_ID)
+    chat(service, "real")
+    assert [session["session_id"] for session in service.get_all_sessions()] == ["real"]
+
+def test_cleared_session_is_not_listed(service):
+    chat(service, "a")
+    chat(service, "b")
+    assert service.clear_session_history("a")
+    assert [session["session_id"] for session in service.get_all_sessions()] == ["b"]
+
+def test_pages_do_not_read_messages(service, monkeypatch):
+    chat(service, "a")
+    chat(service, "b")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("listed sessions by reading the chat history")
+
+    histories = memory.get_chat_history_collection()
+    monkeypatch.setattr(histories, "aggregate", fail)
+    monkeypatch.setattr(histories, "find", fail)
+    assert len(service.list_sessions(limit=1)[0]) == 1
+
+def test_existing_histories_are_backfilled(mongo):
+    SessionService().get_or_create_session_history("old").add_messages([HumanMessage(content="hello")])
+    memory.get_sessions_collection().delete_many({})
+
+    memory.ensure_indexes()
+
+    sessions = SessionService().get_all_sessions()
+    assert [(session["session_id"], session["message_count"]) for session in sessions] == [("old", 1)]
+
+def test_invalid_cursor(service):
+    with pytest.raises(ValueError):
+        service.list_sessions(limit=1, after="not-a-cursor")
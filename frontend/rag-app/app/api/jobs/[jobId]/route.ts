@@ -0,0 +1,14 @@
+import { NextRequest, NextResponse } from "next/server";
+
+export async function GET(_req: NextRequest, { params }: { params: Promise<{ jobId: string }> }) {
+    const { jobId } = await params;
+    const backendUrl = process.env.AI_SERVER_URL || "http://localhost:8888";
+    const res = await fetch(`${backendUrl}/jobs/${jobId}`, { cache: "no-store" });
+
+    if (!res.ok) {
+        return NextResponse.json({ error: "Backend error" }, { status: res.status });
+    }
+
+    const data = await res.json();
+    return NextResponse.json(data);
+}
@@ -3,7 +3,7 @@
 import { useState, useRef, useCallback } from 'react';
 import { useRouter } from 'next/navigation';
 import { useDocumentContext } from '@/providers/DocumentContext';
-import { UploadedDocument } from '@/types';
+import { IngestionJob, UploadedDocument } from '@/types';
 
 interface UseFileUploadOptions {
     /** Current session ID — if provided, the file is appended to this session */
@@ -12,6 +12,31 @@ interface UseFileUploadOptions {
     onSessionCreated?: (sessionId: string) => void;
 }
 
+const JOB_POLL_INTERVAL_MS = 1000;
+/** Failed polls in a row (e.g. a 404 from a worker that hasn't seen the job yet) before giving up */
+const JOB_POLL_MAX_FAILURES = 10;
+
+/** Poll the ingestion job until the document has been indexed */
+async function waitForJob(jobId: string): Promise<IngestionJob> {
+    let failures = 0;
+    for (;;) {
+        const res = await fetch(`/api/jobs/${jobId}`);
+        if (!res.ok) {
+            failures += 1;
+            if (failures >= JOB_POLL_MAX_FAILURES) throw new Error('Failed to fetch ingestion job');
+            await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+            continue;
+        }
+        failures = 0;
+
+        const job: IngestionJob = await res.json();
+        if (job.stage === 'completed') return job;
+        if (job.stage === 'failed') throw new Error(job.error ?? 'Ingestion failed');
+
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
 export function useFileUpload(options: UseFileUploadOptions = {}) {
     const { sessionId, onSessionCreated } = options;
     const [uploading, setUploading] = useState(false);
@@ -45,6 +70,11 @@ export function useFileUpload(options: UseFileUploadOptions = {}) {
                 const res = await uploadRes.json();
                 const finalSessionId = res.session_id || newSessionId;
 
+                // The backend indexes the file in the background
+                if (res.job_id) {
+                    await waitForJob(res.job_id);
+                }
+
                 const doc: UploadedDocument = {
                     id: crypto.randomUUID(),
                     name: file.name,
@@ -19,3 +19,17 @@ export interface ChatSession {
     preview: string;
     message_count: number;
 }
+
+export interface IngestionJob {
+    job_id: string;
+    session_id: string | null;
+    filename: string;
+    stage: 'queued' | 'loading' | 'embedding' | 'indexing' | 'completed' | 'failed';
+    total_pages: number;
+    pages_processed: number;
+    chunks_total: number;
+    chunks_embedded: number;
+    embedding_cache_hits: number;
+    embedding_cache_hit_ratio: number | null;
+    error: string | null;
+}